@@ -0,0 +1,7 @@
+import sys
+
+from app.cli import main
+
+# Проверка нужна процессам пула: при запуске через spawn они заново импортируют этот модуль
+if __name__ == "__main__":
+    sys.exit(main())
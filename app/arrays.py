@@ -0,0 +1,65 @@
+import numpy as np
+
+# Расчёты по транзакциям в столбцах NumPy. Суммы — int64 в копейках, поэтому итоги
+# точные и считаются векторно, без циклов Python по строкам.
+
+
+# Транзакции в виде столбцов: date (datetime64[D]), account_id (int64),
+# category (int32 — номер в списке categories), amount (int64, копейки)
+class TransactionColumns:
+    def __init__(self, date, account_id, category, categories, amount):
+        self.date = date
+        self.account_id = account_id
+        self.category = category
+        self.categories = categories
+        self.amount = amount
+
+    def __len__(self):
+        return len(self.amount)
+
+
+# Загружает транзакции из Database.iter_transaction_values (фильтры те же) в столбцы.
+# Каждая пачка строк переводится в массивы сразу, так что промежуточных кортежей
+# в памяти не больше одной пачки.
+def load_transactions(db, date_from=None, date_to=None, account_id=None, category=None):
+    dates, accounts, codes, amounts = [], [], [], []
+    # Номера категорий в порядке первого появления
+    index = {}
+    for rows in db.iter_transaction_values(date_from, date_to, account_id, category):
+        d, a, c, m = zip(*rows)
+        dates.append(np.array(d, dtype="datetime64[D]"))
+        accounts.append(np.array(a, dtype=np.int64))
+        codes.append(np.array([index.setdefault(x or "", len(index)) for x in c], dtype=np.int32))
+        amounts.append(np.array(m, dtype=np.int64))
+    if not amounts:
+        return TransactionColumns(
+            np.empty(0, dtype="datetime64[D]"), np.empty(0, dtype=np.int64),
+            np.empty(0, dtype=np.int32), [], np.empty(0, dtype=np.int64)
+        )
+    return TransactionColumns(
+        np.concatenate(dates), np.concatenate(accounts),
+        np.concatenate(codes), list(index), np.concatenate(amounts)
+    )
+
+
+# Суммы по группам: keys — массив ключей (даты, счета, коды категорий).
+# Возвращает отсортированные уникальные ключи и int64-суммы amounts по каждому.
+def group_totals(keys, amounts):
+    if not len(keys):
+        return keys[:0], np.zeros(0, dtype=np.int64)
+    order = np.argsort(keys, kind="stable")
+    keys = keys[order]
+    starts = np.flatnonzero(np.concatenate(([True], keys[1:] != keys[:-1])))
+    return keys[starts], np.add.reduceat(amounts[order], starts)
+
+
+# Накопленный баланс после каждой суммы (суммы должны идти по времени)
+def running_balance(amounts, opening=0):
+    return opening + np.cumsum(amounts, dtype=np.int64)
+
+
+# Изменение и баланс по дням: (дни, итог дня, баланс на конец дня)
+def daily_totals(columns, opening=0):
+    days, totals = group_totals(columns.date, columns.amount)
+    return days, totals, running_balance(totals, opening)
+
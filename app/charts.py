@@ -0,0 +1,150 @@
+import threading
+from collections import OrderedDict
+
+import numpy as np
+from matplotlib import dates as mdates
+from matplotlib.backends.backend_qt5agg import FigureCanvasQTAgg as FigureCanvas
+from matplotlib.backends.backend_qt5agg import NavigationToolbar2QT as NavigationToolbar
+from matplotlib.figure import Figure
+from PyQt5 import QtWidgets
+
+# Сколько рядов графиков хранится в кэше
+CACHE_SIZE = 32
+# До какого числа точек на графике рисуются маркеры
+MARKERS_MAX_POINTS = 200
+
+
+# Преобразует строки daily_balance_series в массивы NumPy:
+# даты (числа дней matplotlib) и балансы в рублях. Даты разбираются векторно через datetime64,
+# копейки переводятся в рубли одним делением массива.
+def series_arrays(rows):
+    if not rows:
+        return np.empty(0), np.empty(0)
+    dates, balances = zip(*((r["date"], r["balance_cents"]) for r in rows))
+    x = mdates.date2num(np.array(dates, dtype="datetime64[D]"))
+    return x, np.array(balances, dtype=np.int64) / 100
+
+
+# Прореживает ряд до buckets корзин, оставляя в каждой минимум и максимум (в порядке по времени),
+# чтобы на графике сохранялись все пики. Без циклов Python: одна сортировка по корзинам.
+def downsample_minmax(x, y, buckets):
+    n = len(x)
+    if buckets <= 0 or n <= 2 * buckets:
+        return x, y
+    starts = np.linspace(0, n, buckets, endpoint=False).astype(np.intp)
+    lengths = np.diff(np.append(starts, n))
+    # После сортировки по (корзина, значение) первая позиция каждой корзины — её минимум (максимум)
+    bucket = np.repeat(np.arange(buckets), lengths)
+    min_idx = np.lexsort((y, bucket))[starts]
+    max_idx = np.lexsort((-y, bucket))[starts]
+    idx = np.unique(np.concatenate((min_idx, max_idx)))
+    return x[idx], y[idx]
+
+
+# LRU-кэш рядов графиков по ключу (account_id, date_from, date_to).
+# Сбрасывается подпиской на Database.add_write_listener при записи по счёту.
+# Записи могут приходить из фонового потока, поэтому доступ под блокировкой.
+class SeriesCache:
+    def __init__(self, size=CACHE_SIZE):
+        self.size = size
+        self._items = OrderedDict()
+        self._generations = {}
+        self._lock = threading.Lock()
+
+    # Номер «поколения» данных счёта: меняется при каждой записи.
+    # Запоминается перед запросом, чтобы не положить в кэш ряд, устаревший пока он читался.
+    def generation(self, account_id):
+        with self._lock:
+            return self._generations.get(account_id, 0)
+
+    def get(self, key):
+        with self._lock:
+            value = self._items.get(key)
+            if value is not None:
+                self._items.move_to_end(key)
+            return value
+
+    def put(self, key, value, generation):
+        with self._lock:
+            if self._generations.get(key[0], 0) != generation:
+                return
+            self._items[key] = value
+            self._items.move_to_end(key)
+            while len(self._items) > self.size:
+                self._items.popitem(last=False)
+
+    # Слушатель записей: любое изменение счёта сдвигает весь его ряд балансов
+    def invalidate(self, changes):
+        accounts = {account_id for account_id, _ in changes}
+        with self._lock:
+            for account_id in accounts:
+                self._generations[account_id] = self._generations.get(account_id, 0) + 1
+            for key in [k for k in self._items if k[0] in accounts]:
+                del self._items[key]
+
+
+# Окно графика баланса счёта с панелью масштабирования и сдвига.
+# Полный ряд хранится в памяти, а на холсте рисуется только видимый диапазон,
+# прореженный до ширины осей в пикселях; при масштабировании ряд прореживается заново.
+class BalanceChartDialog(QtWidgets.QDialog):
+    def __init__(self, title, x, y, parent=None):
+        super().__init__(parent)
+        self.setWindowTitle(f"График счёта: {title}")
+        self.resize(900, 600)
+        self.x = x
+        self.y = y
+
+        self.fig = Figure(figsize=(9, 6))
+        self.canvas = FigureCanvas(self.fig)
+        self.ax = self.fig.add_subplot(111)
+
+        layout = QtWidgets.QVBoxLayout(self)
+        layout.addWidget(NavigationToolbar(self.canvas, self))
+        layout.addWidget(self.canvas)
+
+        px, py = self._visible(x[0], x[-1])
+        self.line, = self.ax.plot(px, py, linestyle='-', linewidth=2)
+        self._update_markers(len(px))
+        self.ax.xaxis_date()
+        self.ax.grid(True)
+        self.ax.set_title(f"Изменение баланса: {title}")
+        self.ax.set_xlabel("Дата")
+        self.ax.set_ylabel("Баланс, ₽")
+
+        locator = mdates.AutoDateLocator(minticks=5, maxticks=10)  # максимум 10 подписей
+        formatter = mdates.DateFormatter("%d.%m.%Y")
+        self.ax.xaxis.set_major_locator(locator)
+        self.ax.xaxis.set_major_formatter(formatter)
+        self.fig.autofmt_xdate(rotation=45)
+
+        self.ax.text(
+            x[-1], y[-1],
+            f"{y[-1]:,.2f} ₽",
+            fontsize=10, color='blue', ha='left', va='bottom'
+        )
+        if len(x) == 1:
+            self.ax.set_xlim(x[0] - 1, x[0] + 1)
+
+        self.ax.callbacks.connect("xlim_changed", self._on_xlim_changed)
+        self.canvas.draw_idle()
+
+    # Видимая часть ряда, прореженная до ширины осей в пикселях (две точки на пиксель)
+    def _visible(self, left, right):
+        lo = max(np.searchsorted(self.x, left, side="left") - 1, 0)
+        hi = min(np.searchsorted(self.x, right, side="right") + 1, len(self.x))
+        width = int(self.ax.bbox.width) or 800
+        return downsample_minmax(self.x[lo:hi], self.y[lo:hi], width // 2)
+
+    def _update_markers(self, points):
+        self.line.set_marker('o' if points <= MARKERS_MAX_POINTS else '')
+
+    def _on_xlim_changed(self, ax):
+        px, py = self._visible(*ax.get_xlim())
+        self.line.set_data(px, py)
+        self._update_markers(len(px))
+        self.canvas.draw_idle()
+
+    def resizeEvent(self, event):
+        super().resizeEvent(event)
+        if hasattr(self, "line"):
+            self._on_xlim_changed(self.ax)
@@ -0,0 +1,203 @@
+import argparse
+import json
+import time
+
+from app.database import ARCHIVE_KEEP_YEARS, DB_PATH, Database
+
+# Командная строка без интерфейса Qt: python -m app <команда> ...
+# Каждая команда печатает в stdout одну строку JSON:
+#     {"command": ..., "status": "ok" | "error", "timings": {шаг: секунды, ..., "total": ...}, "result": ...}
+# Код возврата 1 — ошибка (текст в поле "error").
+
+
+# Длительность шагов команды (секунды) для вывода в JSON
+class Timings:
+    def __init__(self):
+        self.start = self.last = time.perf_counter()
+        self.steps = {}
+
+    def mark(self, step):
+        now = time.perf_counter()
+        self.steps[step] = round(now - self.last, 6)
+        self.last = now
+
+    def as_dict(self):
+        return dict(self.steps, total=round(self.last - self.start, 6))
+
+
+def cmd_import(db, args, timings):
+    from app.importer import read_statement
+
+    count = db.import_transactions(read_statement(args.file, args.account))
+    timings.mark("import")
+    return {"imported": count}
+
+
+def cmd_export(db, args, timings):
+    from app.exporter import export_daily_balances, export_transactions
+
+    if args.daily:
+        rows = export_daily_balances(db, args.file, args.date_from, args.date_to, args.account_id)
+    else:
+        rows = export_transactions(
+            db, args.file, args.date_from, args.date_to, args.account_id, args.category, args.receipts
+        )
+    timings.mark("export")
+    return {"rows": rows}
+
+
+def cmd_report(db, args, timings):
+    from app.reports import REPORTS, Ranking
+
+    report = REPORTS[args.name](db, args.date_from, args.date_to, args.account_id)
+    timings.mark("report")
+    # Суммы — целые копейки
+    if isinstance(report, Ranking):
+        return {
+            "labels": report.labels,
+            "income_cents": report.income.tolist(),
+            "expense_cents": report.expense.tolist(),
+            "count": report.count.tolist(),
+        }
+    return {
+        "rows": report.rows,
+        "columns": report.columns,
+        "income_cents": report.income.tolist(),
+        "expense_cents": report.expense.tolist(),
+        "count": report.count.tolist(),
+    }
+
+
+# Сверка балансов счетов с журналом (Database.reconcile_balances): по умолчанию только счета,
+# изменённые после прошлой сверки, --full — все. --daily дополнительно пересчитывает накопленные
+# балансы каждого счёта в пуле процессов и сверяет их с daily_balances.
+# --repair исправляет балансы (и дневные итоги) счетов с расхождениями.
+def cmd_reconcile(db, args, timings):
+    accounts = db.reconcile_balances(full=args.full)
+    timings.mark("balances")
+    drifted = [a["account_id"] for a in accounts if a["drift_cents"] != 0]
+    result = {"checked": accounts, "drifted": drifted, "repaired": []}
+    if args.daily:
+        from app.maintenance import check_daily_balances, run_in_pool
+
+        checks = run_in_pool(db, check_daily_balances, [a["id"] for a in db.list_accounts()], args.workers)
+        timings.mark("daily")
+        result["daily"] = checks
+        result["daily_mismatched"] = [c["account_id"] for c in checks if c["first_mismatch"] is not None]
+    if args.repair:
+        db.repair_balances(drifted)
+        for account_id in result.get("daily_mismatched", []):
+            db.rebuild_daily_balances(account_id)
+        result["repaired"] = sorted(set(drifted) | set(result.get("daily_mismatched", [])))
+        timings.mark("repair")
+    return result
+
+
+def cmd_maintenance(db, args, timings):
+    if args.task == "vacuum":
+        if args.full:
+            db.vacuum()
+        else:
+            while db.incremental_vacuum(min_free_pages=1):
+                pass
+        timings.mark("vacuum")
+        return {"size_bytes": db.path.stat().st_size}
+
+    if args.task == "integrity":
+        problems = db.integrity_check(quick=args.quick)
+        timings.mark("integrity")
+        return {"ok": not problems, "problems": problems}
+
+    if args.task == "thumbnails":
+        from app.maintenance import build_thumbnails, run_in_pool, thumbnail_batches
+
+        hashes = db.receipt_hashes(missing_thumbnails=not args.rebuild)
+        timings.mark("list")
+        batches = run_in_pool(db, build_thumbnails, thumbnail_batches(hashes), args.workers)
+        timings.mark("encode")
+        thumbnails = [pair for batch in batches for pair in batch]
+        db.store_thumbnails(thumbnails)
+        timings.mark("store")
+        return {"receipts": len(hashes), "thumbnails": sum(1 for _, data in thumbnails if data is not None)}
+
+    if args.task == "archive":
+        archived = db.archive_closed_years(args.keep)
+        timings.mark("archive")
+        return {"archived": archived, "years": db.archived_years()}
+
+
+def build_parser():
+    parser = argparse.ArgumentParser(prog="python -m app", description="Finance Manager без интерфейса")
+    parser.add_argument("--db", default=DB_PATH, help="файл базы (по умолчанию finance.db рядом с программой)")
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    def add_filters(p):
+        p.add_argument("--from", dest="date_from", help="начало периода YYYY-MM-DD (включительно)")
+        p.add_argument("--to", dest="date_to", help="конец периода YYYY-MM-DD (включительно)")
+        p.add_argument("--account-id", type=int, help="только этот счёт")
+
+    def add_workers(p):
+        p.add_argument("--workers", type=int, help="число процессов (по умолчанию — по числу ядер, 1 — без пула)")
+
+    p = commands.add_parser("import", help="импорт выписки CSV/OFX")
+    p.add_argument("file")
+    p.add_argument("--account", help="счёт для строк, где он не указан в выписке")
+    p.set_defaults(handler=cmd_import)
+
+    p = commands.add_parser("export", help="экспорт транзакций или дневных итогов в CSV/JSONL (.gz)")
+    p.add_argument("file")
+    p.add_argument("--daily", action="store_true", help="дневные итоги счетов вместо транзакций")
+    p.add_argument("--category")
+    p.add_argument("--receipts", help="папка для фото чеков")
+    add_filters(p)
+    p.set_defaults(handler=cmd_export)
+
+    from app.reports import REPORTS
+
+    p = commands.add_parser("report", help="отчёт по категориям или счетам")
+    p.add_argument("name", choices=sorted(REPORTS))
+    add_filters(p)
+    p.set_defaults(handler=cmd_report)
+
+    p = commands.add_parser("reconcile", help="сверка балансов счетов с транзакциями")
+    p.add_argument("--full", action="store_true", help="проверить все счета, а не только изменённые")
+    p.add_argument("--daily", action="store_true", help="также пересчитать дневные итоги в пуле процессов")
+    p.add_argument("--repair", action="store_true", help="исправить найденные расхождения")
+    add_workers(p)
+    p.set_defaults(handler=cmd_reconcile)
+
+    p = commands.add_parser("maintenance", help="обслуживание базы")
+    tasks = p.add_subparsers(dest="task", required=True)
+    t = tasks.add_parser("vacuum", help="вернуть свободное место файловой системе")
+    t.add_argument("--full", action="store_true", help="полный VACUUM (перезаписывает весь файл)")
+    t = tasks.add_parser("integrity", help="проверка целостности базы и архивов")
+    t.add_argument("--quick", action="store_true", help="quick_check без сверки индексов")
+    t = tasks.add_parser("thumbnails", help="построить миниатюры чеков в пуле процессов")
+    t.add_argument("--rebuild", action="store_true", help="перестроить все миниатюры, а не только недостающие")
+    add_workers(t)
+    t = tasks.add_parser("archive", help="перенести закрытые годы в архив")
+    t.add_argument("--keep", type=int, default=ARCHIVE_KEEP_YEARS, help="сколько последних лет оставить")
+    p.set_defaults(handler=cmd_maintenance)
+    return parser
+
+
+def main(argv=None):
+    args = build_parser().parse_args(argv)
+    timings = Timings()
+    output = {"command": args.command if args.command != "maintenance" else f"maintenance {args.task}"}
+    db = None
+    try:
+        db = Database(args.db)
+        timings.mark("open")
+        result = args.handler(db, args, timings)
+    except Exception as e:
+        output.update(status="error", error=str(e), timings=timings.as_dict())
+        code = 1
+    else:
+        output.update(status="ok", timings=timings.as_dict(), result=result)
+        code = 0
+    finally:
+        if db is not None:
+            db.close()
+    print(json.dumps(output, ensure_ascii=False))
+    return code
@@ -0,0 +1,104 @@
+import sqlite3
+import threading
+from contextlib import contextmanager
+
+from app.profiling import ProfilingConnection
+
+# Настройки каждого соединения: кэш страниц 64 МБ (отрицательное значение — в КиБ),
+# отображение файла в память до 256 МБ, временные таблицы и сортировки — в памяти
+CONNECTION_PRAGMAS = [
+    "PRAGMA cache_size = -65536",
+    "PRAGMA mmap_size = 268435456",
+    "PRAGMA temp_store = MEMORY",
+    "PRAGMA busy_timeout = 5000",
+]
+# Журнал WAL: читатели не блокируют запись и наоборот. В режиме WAL synchronous=NORMAL
+# не рискует целостностью базы (при сбое питания теряются лишь последние транзакции).
+# auto_vacuum задаётся до включения WAL: после него новый файл уже не сменит режим без VACUUM
+# (для существующей базы режим применяет Database._enable_incremental_vacuum)
+WRITER_PRAGMAS = [
+    "PRAGMA auto_vacuum = INCREMENTAL",
+    "PRAGMA journal_mode = WAL",
+    "PRAGMA synchronous = NORMAL",
+]
+# Сколько свободных соединений для чтения хранится в пуле
+READ_POOL_SIZE = 4
+
+
+# Соединения с одним файлом базы: одно для записи и пул соединений только для чтения.
+# Читатели берутся из пула на время запроса, поэтому фоновые выборки (графики, поиск,
+# экспорт) не ждут записи. Соединения пула не привязаны к потоку, но в каждый момент
+# используются только одним потоком.
+# read_only=True — одно соединение только для чтения без пула (для процессов-обработчиков,
+# которые только читают базу): через него идут все выборки, а запись невозможна.
+class ConnectionManager:
+    def __init__(self, path, pool_size=READ_POOL_SIZE, read_only=False):
+        self.path = path
+        self.pool_size = pool_size
+        self.read_only = read_only
+        self.memory = str(path) == ":memory:"
+        self._pool = []
+        # Читатели, взятые из пула сейчас (для interrupt)
+        self._active = set()
+        self._lock = threading.Lock()
+        self.writer = self.connect(read_only)
+        if not read_only:
+            for pragma in WRITER_PRAGMAS:
+                self.writer.execute(pragma).fetchall()
+
+    def connect(self, read_only=False):
+        # PARSE_COLNAMES: колонки с псевдонимом вида "amount [money]" преобразуются в Decimal
+        if read_only:
+            uri = self.path.resolve().as_uri() + "?mode=ro"
+            conn = sqlite3.connect(uri, uri=True, factory=ProfilingConnection, check_same_thread=False,
+                                   detect_types=sqlite3.PARSE_COLNAMES)
+        else:
+            conn = sqlite3.connect(self.path, factory=ProfilingConnection, detect_types=sqlite3.PARSE_COLNAMES)
+        conn.row_factory = sqlite3.Row
+        for pragma in CONNECTION_PRAGMAS:
+            conn.execute(pragma).fetchall()
+        return conn
+
+    # Соединение для чтения из пула (новое, если пул пуст); после выхода из блока возвращается в пул.
+    # База в памяти видна только своему соединению, поэтому для неё читает соединение записи.
+    @contextmanager
+    def reader(self):
+        if self.memory or self.read_only:
+            yield self.writer
+            return
+        with self._lock:
+            conn = self._pool.pop() if self._pool else None
+        if conn is None:
+            conn = self.connect(read_only=True)
+        with self._lock:
+            self._active.add(conn)
+        try:
+            yield conn
+        finally:
+            if conn.in_transaction:
+                conn.rollback()
+            with self._lock:
+                self._active.discard(conn)
+                if len(self._pool) < self.pool_size:
+                    self._pool.append(conn)
+                    conn = None
+            if conn is not None:
+                conn.close()
+
+    # Прерывает выполняющиеся запросы соединения записи и взятых из пула читателей
+    # (они завершаются ошибкой sqlite3.OperationalError). Можно вызывать из другого потока.
+    def interrupt(self):
+        with self._lock:
+            self.writer.interrupt()
+            for conn in self._active:
+                conn.interrupt()
+
+    def close(self):
+        with self._lock:
+            pool, self._pool = self._pool, []
+        for conn in pool:
+            conn.close()
+        if not self.read_only:
+            # Обновляет статистику планировщика по таблицам, где она устарела
+            self.writer.execute("PRAGMA optimize").fetchall()
+        self.writer.close()
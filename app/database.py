@@ -1,7 +1,14 @@
-import sqlite3
+import datetime
+import hashlib
+import os
 import sys
+from contextlib import contextmanager
 from pathlib import Path
 
+from app.connections import ConnectionManager
+from app.money import to_cents
+from app.profiling import ProfilingConnection
+
 # Если приложение "заморожено" (например, скомпилировано в .exe с помощью PyInstaller),
 # то база данных будет находиться рядом с исполняемым файлом.
 # Иначе — рядом с исходным кодом .py.
@@ -12,17 +19,115 @@ else:
 
 DB_PATH = BASE_DIR / "finance.db"
 
+# Сколько строк импорта записывается одной транзакцией базы
+IMPORT_CHUNK_SIZE = 20000
+
+# Сколько строк читается из курсора за раз при потоковой выборке
+FETCH_CHUNK_SIZE = 5000
+
+# Поля, по которым transaction_totals группирует транзакции
+TOTALS_GROUPS = {
+    "month": "substr(date, 1, 7)",
+    "category": "COALESCE(category, '')",
+    "account": "account_id",
+}
+
+# Колонки и настройки полнотекстового индекса транзакций (в текущей базе и в архивах)
+SEARCH_INDEX_SPEC = """date, account, category, comment,
+    tokenize='unicode61 remove_diacritics 2',
+    prefix='2 3'"""
+
+# Архив закрытых лет: по файлу на год в папке archive рядом с файлом базы
+ARCHIVE_DIR_NAME = "archive"
+# Сколько последних лет (включая текущий) остаётся в основном файле при архивировании
+ARCHIVE_KEEP_YEARS = 2
+# Сколько баз можно подключить к одному соединению SQLite (SQLITE_MAX_ATTACHED по умолчанию)
+ARCHIVE_ATTACH_LIMIT = 10
+# Колонки таблиц, которые делятся на текущую часть и архивы
+PARTITIONED_TABLES = {
+    "transactions": "id, date, account_id, category, amount, comment, receipt_hash",
+    "daily_balances": "account_id, date, delta, running_balance",
+}
+
+# Контрольная сумма транзакций счёта для сверки балансов (reconcile_balances): сумма по строкам
+# квадратов (id * CHECKSUM_ID_FACTOR + amount * CHECKSUM_AMOUNT_FACTOR) по простому модулю.
+# Слагаемое зависит и от id, и от суммы, а квадрат делает его нелинейным, поэтому перенос строк
+# между счетами и перестановка сумм между строками (итог тот же) меняют контрольную сумму.
+# Модуль меньше 2^31: квадрат остатка и SUM на миллионах строк не переполняют INTEGER.
+CHECKSUM_ID_FACTOR = 48271
+CHECKSUM_AMOUNT_FACTOR = 16807
+CHECKSUM_MODULUS = 2147483647
 
-# Класс для работы с локальной базой данных финансов
+# Порог свободных страниц, после которого освобождённое место возвращается файловой системе
+VACUUM_MIN_FREE_PAGES = 256
+# Сколько страниц освобождается за один вызов incremental_vacuum
+VACUUM_STEP_PAGES = 2048
+
+
+# Класс для работы с локальной базой данных финансов.
+# Суммы принимаются как Decimal (а также str, int или float) и возвращаются как Decimal;
+# в базе они хранятся целыми копейками.
 class Database:
-    def __init__(self):
-        self.conn = sqlite3.connect(DB_PATH)
-        self.conn.row_factory = sqlite3.Row
-        self._create_tables()
+    # Подписчики на изменения данных (кэши графиков и отчётов). Список общий для всех
+    # экземпляров, так как запись может идти и через соединение фонового потока.
+    write_listeners = []
+
+    # path — файл базы; по умолчанию finance.db рядом с программой.
+    # conn — соединение для записи; выборки идут через пул соединений только для чтения.
+    # read_only=True открывает уже созданную базу одним соединением только для чтения
+    # (миграции не выполняются, методы записи завершатся ошибкой SQLite).
+    def __init__(self, path=None, read_only=False):
+        self.path = Path(path) if path is not None else DB_PATH
+        self.connections = ConnectionManager(self.path, read_only=read_only)
+        self.conn = self.connections.writer
+        self._savepoints = 0
+        self._pending_changes = None
+        if not read_only:
+            self._create_tables()
+
+    def close(self):
+        self.connections.close()
+
+    # Прерывает запросы, выполняющиеся сейчас через эту базу, включая выборки из пула читателей
+    def interrupt(self):
+        self.connections.interrupt()
 
     def _create_tables(self):
         cur = self.conn.cursor()
+        self._enable_incremental_vacuum(cur)
+        self._migrate(cur)
+        cur.execute("PRAGMA foreign_keys = ON")
+
+    # Применяет недостающие миграции схемы. Номер последней применённой миграции
+    # хранится в PRAGMA user_version; каждая миграция выполняется в своей транзакции.
+    def _migrate(self, cur):
+        migrations = [
+            self._schema_v1,
+            self._schema_v2,
+            self._schema_v3,
+            self._schema_v4,
+            self._schema_v5,
+            self._schema_v6,
+            self._schema_v7,
+            self._schema_v8,
+            self._schema_v9,
+        ]
+        version = cur.execute("PRAGMA user_version").fetchone()[0]
+        for number, migration in enumerate(migrations, start=1):
+            if number <= version:
+                continue
+            cur.execute("BEGIN")
+            try:
+                migration(cur)
+                cur.execute(f"PRAGMA user_version = {number}")
+            except Exception:
+                self.conn.rollback()
+                raise
+            self.conn.commit()
 
+    # v1: счета, транзакции, хранилище чеков и поисковый индекс.
+    # Написана через IF NOT EXISTS, так как базы до появления миграций могут быть в разном состоянии.
+    def _schema_v1(self, cur):
         # Таблица счетов
         cur.execute('''
             CREATE TABLE IF NOT EXISTS accounts(
@@ -41,88 +146,1206 @@ class Database:
                 category TEXT,
                 amount REAL,
                 comment TEXT,
-                photo BLOB
+                receipt_hash TEXT
             )
         ''')
-        self.conn.commit()
+
+        # Фото чеков хранятся отдельно и адресуются по SHA-256 содержимого,
+        # поэтому одинаковые изображения записываются один раз
+        cur.execute('''
+            CREATE TABLE IF NOT EXISTS receipts(
+                hash TEXT PRIMARY KEY,
+                data BLOB
+            )
+        ''')
+        self._migrate_receipts(cur)
+
+        # Индекс для постраничной выборки транзакций (по дате и id)
+        cur.execute('CREATE INDEX IF NOT EXISTS idx_transactions_date ON transactions(date, id)')
+        cur.execute('CREATE INDEX IF NOT EXISTS idx_transactions_receipt ON transactions(receipt_hash)')
+        self._create_search_index(cur)
+
+    # v2: внешний ключ transactions.account_id -> accounts.id (ON DELETE CASCADE)
+    # и индексы для выборок по счёту, категории и имени счёта.
+    # SQLite не умеет добавлять внешний ключ в существующую таблицу, поэтому она пересоздаётся.
+    def _schema_v2(self, cur):
+        # Триггер ссылается на transactions и мешает переименованию новой таблицы
+        cur.execute("DROP TRIGGER IF EXISTS accounts_fts_rename")
+        sequences = self._sequences(cur)
+        cur.execute('''
+            CREATE TABLE transactions_new(
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                date TEXT,
+                account_id INTEGER REFERENCES accounts(id) ON DELETE CASCADE,
+                category TEXT,
+                amount REAL,
+                comment TEXT,
+                receipt_hash TEXT
+            )
+        ''')
+        cur.execute('''
+            INSERT INTO transactions_new(id, date, account_id, category, amount, comment, receipt_hash)
+            SELECT id, date, account_id, category, amount, comment, receipt_hash FROM transactions
+        ''')
+        cur.execute("DROP TABLE transactions")
+        cur.execute("ALTER TABLE transactions_new RENAME TO transactions")
+        self._restore_sequences(cur, sequences, ["transactions"])
+
+        cur.execute('CREATE INDEX idx_transactions_date ON transactions(date, id)')
+        cur.execute('CREATE INDEX idx_transactions_receipt ON transactions(receipt_hash)')
+        cur.execute('CREATE INDEX idx_transactions_account_date ON transactions(account_id, date)')
+        cur.execute('CREATE INDEX idx_transactions_category ON transactions(category)')
+        cur.execute('CREATE INDEX IF NOT EXISTS idx_accounts_name ON accounts(name)')
+        # Триггеры удалены вместе со старой таблицей; сам индекс FTS не меняется, так как id сохранены
+        self._create_search_index(cur)
+
+    # v3: дневные итоги по счетам для графиков. delta — сумма транзакций счёта за день,
+    # running_balance — накопленная сумма транзакций счёта по этот день включительно.
+    def _schema_v3(self, cur):
+        cur.execute('''
+            CREATE TABLE daily_balances(
+                account_id INTEGER NOT NULL REFERENCES accounts(id) ON DELETE CASCADE,
+                date TEXT NOT NULL,
+                delta REAL NOT NULL,
+                running_balance REAL NOT NULL,
+                PRIMARY KEY (account_id, date)
+            ) WITHOUT ROWID
+        ''')
+        cur.execute('''
+            INSERT INTO daily_balances(account_id, date, delta, running_balance)
+            SELECT account_id, date, SUM(amount),
+                   SUM(SUM(amount)) OVER (PARTITION BY account_id ORDER BY date)
+            FROM transactions
+            GROUP BY account_id, date
+        ''')
+
+    # v4: миниатюры фото чеков для таблицы транзакций. data = NULL — миниатюру сделать нельзя
+    # (файл не является изображением), чтобы не пытаться снова. Удаляются вместе с чеком.
+    def _schema_v4(self, cur):
+        cur.execute('''
+            CREATE TABLE receipt_thumbnails(
+                hash TEXT PRIMARY KEY REFERENCES receipts(hash) ON DELETE CASCADE,
+                data BLOB
+            ) WITHOUT ROWID
+        ''')
+
+    # v5: денежные колонки — целые копейки вместо REAL. У колонки REAL целые значения
+    # тоже хранятся как REAL, поэтому таблицы пересоздаются с типом INTEGER.
+    # Балансы округляются до копейки (накопившаяся ошибка сложения REAL отбрасывается),
+    # дневные итоги пересчитываются из транзакций заново.
+    def _schema_v5(self, cur):
+        # Триггеры поиска ссылаются на accounts и transactions и мешают их пересозданию
+        for trigger in ("transactions_fts_insert", "transactions_fts_delete",
+                        "transactions_fts_update", "accounts_fts_rename"):
+            cur.execute(f"DROP TRIGGER IF EXISTS {trigger}")
+        sequences = self._sequences(cur)
+
+        cur.execute('''
+            CREATE TABLE accounts_new(
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                name TEXT,
+                balance INTEGER NOT NULL DEFAULT 0
+            )
+        ''')
+        cur.execute('''
+            INSERT INTO accounts_new(id, name, balance)
+            SELECT id, name, CAST(ROUND(COALESCE(balance, 0) * 100) AS INTEGER) FROM accounts
+        ''')
+        cur.execute("DROP TABLE accounts")
+        cur.execute("ALTER TABLE accounts_new RENAME TO accounts")
+        cur.execute('CREATE INDEX idx_accounts_name ON accounts(name)')
+
+        cur.execute('''
+            CREATE TABLE transactions_new(
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                date TEXT,
+                account_id INTEGER REFERENCES accounts(id) ON DELETE CASCADE,
+                category TEXT,
+                amount INTEGER NOT NULL,
+                comment TEXT,
+                receipt_hash TEXT
+            )
+        ''')
+        cur.execute('''
+            INSERT INTO transactions_new(id, date, account_id, category, amount, comment, receipt_hash)
+            SELECT id, date, account_id, category, CAST(ROUND(COALESCE(amount, 0) * 100) AS INTEGER),
+                   comment, receipt_hash
+            FROM transactions
+        ''')
+        cur.execute("DROP TABLE transactions")
+        cur.execute("ALTER TABLE transactions_new RENAME TO transactions")
+        cur.execute('CREATE INDEX idx_transactions_date ON transactions(date, id)')
+        cur.execute('CREATE INDEX idx_transactions_receipt ON transactions(receipt_hash)')
+        cur.execute('CREATE INDEX idx_transactions_account_date ON transactions(account_id, date)')
+        cur.execute('CREATE INDEX idx_transactions_category ON transactions(category)')
+
+        self._restore_sequences(cur, sequences, ["accounts", "transactions"])
+
+        cur.execute("DROP TABLE daily_balances")
+        cur.execute('''
+            CREATE TABLE daily_balances(
+                account_id INTEGER NOT NULL REFERENCES accounts(id) ON DELETE CASCADE,
+                date TEXT NOT NULL,
+                delta INTEGER NOT NULL,
+                running_balance INTEGER NOT NULL,
+                PRIMARY KEY (account_id, date)
+            ) WITHOUT ROWID
+        ''')
+        cur.execute('''
+            INSERT INTO daily_balances(account_id, date, delta, running_balance)
+            SELECT account_id, date, SUM(amount),
+                   SUM(SUM(amount)) OVER (PARTITION BY account_id ORDER BY date)
+            FROM transactions
+            GROUP BY account_id, date
+        ''')
+        # Id транзакций сохранены, поэтому сам индекс FTS остаётся прежним
+        self._create_search_index(cur)
+
+    # v6: архив закрытых лет (archive_year). В основной базе остаются список архивных лет,
+    # сумма перенесённых в архив транзакций каждого счёта (opening_balance — с неё начинаются
+    # дневные итоги текущей части) и хэши чеков, на которые ссылается архив (сами фото не переносятся).
+    def _schema_v6(self, cur):
+        cur.execute("ALTER TABLE accounts ADD COLUMN opening_balance INTEGER NOT NULL DEFAULT 0")
+        cur.execute('''
+            CREATE TABLE archives(
+                year INTEGER PRIMARY KEY,
+                transactions INTEGER NOT NULL
+            )
+        ''')
+        cur.execute('''
+            CREATE TABLE archived_receipts(
+                hash TEXT PRIMARY KEY
+            ) WITHOUT ROWID
+        ''')
+
+    # v7: сверка балансов с журналом (reconcile_balances).
+    # initial_balance — начальный остаток счёта, не связанный с транзакциями, так что
+    # balance = initial_balance + opening_balance + сумма транзакций текущей части.
+    # Для существующих счетов он выводится из текущего баланса, то есть расхождения,
+    # накопившиеся до этой миграции, становятся частью начального остатка.
+    # revision увеличивается при каждой записи по счёту; account_checks хранит ревизию,
+    # число, сумму и контрольную сумму транзакций счёта на момент последней успешной сверки.
+    # Индекс по счёту и дате дополняется суммой: сверка и пересчёт дневных итогов
+    # читают только индекс, не обращаясь к строкам таблицы.
+    def _schema_v7(self, cur):
+        cur.execute("DROP INDEX idx_transactions_account_date")
+        cur.execute("CREATE INDEX idx_transactions_account_date_amount ON transactions(account_id, date, amount)")
+        cur.execute("ALTER TABLE accounts ADD COLUMN initial_balance INTEGER NOT NULL DEFAULT 0")
+        cur.execute("ALTER TABLE accounts ADD COLUMN revision INTEGER NOT NULL DEFAULT 0")
+        cur.execute('''
+            UPDATE accounts SET initial_balance = balance - opening_balance
+                - COALESCE((SELECT SUM(amount) FROM transactions WHERE account_id = accounts.id), 0)
+        ''')
+        cur.execute('''
+            CREATE TABLE account_checks(
+                account_id INTEGER PRIMARY KEY REFERENCES accounts(id) ON DELETE CASCADE,
+                revision INTEGER NOT NULL,
+                transactions INTEGER NOT NULL,
+                total INTEGER NOT NULL,
+                checksum INTEGER NOT NULL
+            )
+        ''')
+
+    # v8: индекс по хэшу чека — только для транзакций с фото. Остальные (в том числе все
+    # импортированные) в нём не нужны: чеки ищутся по конкретному хэшу, а обновление
+    # индекса на каждую вставку заметно замедляло импорт.
+    def _schema_v8(self, cur):
+        cur.execute("DROP INDEX idx_transactions_receipt")
+        cur.execute("CREATE INDEX idx_transactions_receipt ON transactions(receipt_hash) WHERE receipt_hash IS NOT NULL")
+
+    # v9: контрольная сумма сверки считается по-новому (см. CHECKSUM_MODULUS) — запомненные
+    # значения не сравнимы с новыми, поэтому следующая сверка проверяет все счета заново
+    def _schema_v9(self, cur):
+        cur.execute("DELETE FROM account_checks")
+
+    # Счётчики AUTOINCREMENT таблиц: {таблица: последний выданный id}
+    @staticmethod
+    def _sequences(cur):
+        return {r["name"]: r["seq"] for r in cur.execute("SELECT name, seq FROM sqlite_sequence")}
+
+    # Восстанавливает счётчики пересозданных таблиц names: новая таблица начинает счёт с MAX(id),
+    # а удалённые раньше id не должны выдаваться повторно
+    @staticmethod
+    def _restore_sequences(cur, sequences, names):
+        for name in names:
+            last_id = cur.execute(f"SELECT COALESCE(MAX(id), 0) FROM {name}").fetchone()[0]
+            cur.execute("DELETE FROM sqlite_sequence WHERE name = ?", (name,))
+            cur.execute(
+                "INSERT INTO sqlite_sequence(name, seq) VALUES (?, ?)", (name, max(sequences.get(name, 0), last_id))
+            )
+
+    # Таблицы файла архива (подключённого как schema): транзакции года, их дневные итоги
+    # и поисковый индекс. Id транзакций сохраняются; внешних ключей нет — счета в основной базе.
+    @staticmethod
+    def _create_archive_tables(cur, schema):
+        cur.execute(f'''
+            CREATE TABLE {schema}.transactions(
+                id INTEGER PRIMARY KEY,
+                date TEXT,
+                account_id INTEGER,
+                category TEXT,
+                amount INTEGER NOT NULL,
+                comment TEXT,
+                receipt_hash TEXT
+            )
+        ''')
+        cur.execute(f'CREATE INDEX {schema}.idx_transactions_date ON transactions(date, id)')
+        cur.execute(f'CREATE INDEX {schema}.idx_transactions_account_date ON transactions(account_id, date)')
+        cur.execute(f'CREATE INDEX {schema}.idx_transactions_category ON transactions(category)')
+        cur.execute(f'''
+            CREATE TABLE {schema}.daily_balances(
+                account_id INTEGER NOT NULL,
+                date TEXT NOT NULL,
+                delta INTEGER NOT NULL,
+                running_balance INTEGER NOT NULL,
+                PRIMARY KEY (account_id, date)
+            ) WITHOUT ROWID
+        ''')
+        cur.execute(f"CREATE VIRTUAL TABLE {schema}.transactions_fts USING fts5({SEARCH_INDEX_SPEC})")
+
+    # Учитывает изменение суммы транзакций счёта за день в daily_balances:
+    # меняется строка этого дня и накопленный итог всех следующих дней счёта.
+    # Первый день текущей части начинается с суммы, перенесённой в архив (opening_balance).
+    @staticmethod
+    def _apply_daily_delta(cur, account_id, date, delta):
+        cur.execute('''
+            INSERT INTO daily_balances(account_id, date, delta, running_balance)
+            VALUES (?, ?, 0, COALESCE(
+                (SELECT running_balance FROM daily_balances
+                 WHERE account_id = ? AND date < ? ORDER BY date DESC LIMIT 1),
+                (SELECT opening_balance FROM accounts WHERE id = ?)))
+            ON CONFLICT(account_id, date) DO NOTHING
+        ''', (account_id, date, account_id, date, account_id))
+        cur.execute(
+            "UPDATE daily_balances SET delta = delta + ? WHERE account_id = ? AND date = ?",
+            (delta, account_id, date)
+        )
+        cur.execute(
+            "UPDATE daily_balances SET running_balance = running_balance + ? WHERE account_id = ? AND date >= ?",
+            (delta, account_id, date)
+        )
+        # День без транзакций больше не нужен графику
+        cur.execute('''
+            DELETE FROM daily_balances WHERE account_id = ? AND date = ?
+            AND NOT EXISTS (SELECT 1 FROM transactions WHERE account_id = ? AND date = ?)
+        ''', (account_id, date, account_id, date))
+
+    # Включает auto_vacuum=INCREMENTAL: удаление данных только помечает страницы свободными,
+    # а файл уменьшается порциями в incremental_vacuum() вместо полного VACUUM
+    def _enable_incremental_vacuum(self, cur):
+        if cur.execute("PRAGMA auto_vacuum").fetchone()[0] == 2:
+            return
+        cur.execute("PRAGMA auto_vacuum = INCREMENTAL")
+        # Для уже существующей базы режим применяется только после полного VACUUM (один раз)
+        if cur.execute("SELECT count(*) FROM sqlite_master").fetchall()[0][0]:
+            self.vacuum()
+
+    # Полнотекстовый индекс FTS5 для поиска по транзакциям (rowid = transactions.id).
+    # Синхронизируется триггерами, поэтому код добавления/удаления о нём не знает.
+    def _create_search_index(self, cur):
+        exists = cur.execute(
+            "SELECT 1 FROM sqlite_master WHERE type='table' AND name='transactions_fts'"
+        ).fetchone()
+        cur.execute(f"CREATE VIRTUAL TABLE IF NOT EXISTS transactions_fts USING fts5({SEARCH_INDEX_SPEC})")
+        self._create_fts_insert_trigger(cur)
+        cur.execute('''
+            CREATE TRIGGER IF NOT EXISTS transactions_fts_delete AFTER DELETE ON transactions BEGIN
+                DELETE FROM transactions_fts WHERE rowid = old.id;
+            END
+        ''')
+        cur.execute('''
+            CREATE TRIGGER IF NOT EXISTS transactions_fts_update
+            AFTER UPDATE OF date, account_id, category, comment ON transactions BEGIN
+                DELETE FROM transactions_fts WHERE rowid = old.id;
+                INSERT INTO transactions_fts(rowid, date, account, category, comment)
+                VALUES (new.id, new.date, (SELECT name FROM accounts WHERE id = new.account_id),
+                        new.category, new.comment);
+            END
+        ''')
+        cur.execute('''
+            CREATE TRIGGER IF NOT EXISTS accounts_fts_rename AFTER UPDATE OF name ON accounts BEGIN
+                UPDATE transactions_fts SET account = new.name
+                WHERE rowid IN (SELECT id FROM transactions WHERE account_id = new.id);
+            END
+        ''')
+
+        # Первичное заполнение индекса для уже существующей базы
+        if not exists:
+            cur.execute('''
+                INSERT INTO transactions_fts(rowid, date, account, category, comment)
+                SELECT t.id, t.date, a.name, t.category, t.comment
+                FROM transactions t
+                LEFT JOIN accounts a ON a.id = t.account_id
+            ''')
+
+    @staticmethod
+    def _create_fts_insert_trigger(cur):
+        cur.execute('''
+            CREATE TRIGGER IF NOT EXISTS transactions_fts_insert AFTER INSERT ON transactions BEGIN
+                INSERT INTO transactions_fts(rowid, date, account, category, comment)
+                VALUES (new.id, new.date, (SELECT name FROM accounts WHERE id = new.account_id),
+                        new.category, new.comment);
+            END
+        ''')
+
+    # Преобразует строку поиска в запрос FTS5: каждое слово ищется по префиксу,
+    # все слова должны встретиться в транзакции
+    @staticmethod
+    def _search_query(text):
+        tokens = text.split()
+        if not tokens:
+            return None
+        return " ".join('"{}"*'.format(tok.replace('"', '""')) for tok in tokens)
+
+    # Переносит фото из старой колонки transactions.photo в таблицу receipts
+    def _migrate_receipts(self, cur):
+        columns = [c["name"] for c in cur.execute("PRAGMA table_info(transactions)")]
+        if "photo" not in columns:
+            return
+        if "receipt_hash" not in columns:
+            cur.execute("ALTER TABLE transactions ADD COLUMN receipt_hash TEXT")
+
+        # Фото читаются по одному, чтобы не держать все изображения в памяти
+        ids = [r["id"] for r in cur.execute("SELECT id FROM transactions WHERE photo IS NOT NULL").fetchall()]
+        for tx_id in ids:
+            data = cur.execute("SELECT photo FROM transactions WHERE id=?", (tx_id,)).fetchone()["photo"]
+            cur.execute("UPDATE transactions SET receipt_hash=? WHERE id=?", (self._store_receipt(cur, data), tx_id))
+
+        # Освободившееся место вернёт incremental_vacuum()
+        cur.execute("ALTER TABLE transactions DROP COLUMN photo")
+
+    # Сохраняет фото в таблицу receipts (если такого ещё нет) и возвращает его хэш
+    @staticmethod
+    def _store_receipt(cur, data):
+        digest = hashlib.sha256(data).hexdigest()
+        cur.execute("INSERT OR IGNORE INTO receipts(hash, data) VALUES (?, ?)", (digest, data))
+        return digest
+
+    # Удаляет фото, на которые больше не ссылается ни одна транзакция (в том числе архивная)
+    @staticmethod
+    def _drop_unused_receipts(cur, hashes):
+        for digest in set(hashes):
+            if digest is None:
+                continue
+            cur.execute('''
+                DELETE FROM receipts WHERE hash=?1
+                AND NOT EXISTS (SELECT 1 FROM transactions WHERE receipt_hash=?1)
+                AND NOT EXISTS (SELECT 1 FROM archived_receipts WHERE hash=?1)
+            ''', (digest,))
+
+    # Подписывает listener(changes) на изменения данных после каждой записи.
+    # changes — множество пар (account_id, месяц 'YYYY-MM'), чьи транзакции изменились;
+    # месяц None означает изменение самого счёта (баланс, создание, удаление);
+    # при удалении счёта приходят также все месяцы его транзакций.
+    # listener может вызываться из фонового потока.
+    @classmethod
+    def add_write_listener(cls, listener):
+        cls.write_listeners.append(listener)
+
+    @classmethod
+    def remove_write_listener(cls, listener):
+        if listener in cls.write_listeners:
+            cls.write_listeners.remove(listener)
+
+    # Включает профилирование запросов всех соединений (в том числе фонового потока);
+    # profiler — app.profiling.QueryProfiler, None выключает профилирование
+    @classmethod
+    def set_profiler(cls, profiler):
+        ProfilingConnection.profiler = profiler
+
+    @classmethod
+    def get_profiler(cls):
+        return ProfilingConnection.profiler
+
+    # Внутри transaction() подписчики узнают об изменениях только после фиксации
+    def _notify_write(self, changes):
+        if self._pending_changes is not None:
+            self._pending_changes.update(changes)
+            return
+        for listener in list(self.write_listeners):
+            listener(changes)
+
+    # Транзакция базы для нескольких записей подряд:
+    #     with db.transaction():
+    #         db.add_transaction(...)
+    #         db.update_account_balance(...)
+    # Фиксируется один раз при выходе из блока, при исключении откатывается целиком.
+    # Методы записи сами используют transaction(), поэтому вложенный блок становится
+    # точкой сохранения (SAVEPOINT) внешней транзакции. Возвращает курсор соединения записи.
+    @contextmanager
+    def transaction(self):
+        cur = self.conn.cursor()
+        if self._pending_changes is not None:
+            self._savepoints += 1
+            name = f"sp{self._savepoints}"
+            cur.execute(f"SAVEPOINT {name}")
+            try:
+                yield cur
+            except BaseException:
+                cur.execute(f"ROLLBACK TO {name}")
+                cur.execute(f"RELEASE {name}")
+                raise
+            else:
+                cur.execute(f"RELEASE {name}")
+            finally:
+                self._savepoints -= 1
+            return
+
+        # Неявно начатая запись (например, миграция) продолжается в этой же транзакции
+        if not self.conn.in_transaction:
+            cur.execute("BEGIN IMMEDIATE")
+        self._pending_changes = changes = set()
+        try:
+            yield cur
+            # Изменённые счета должны попасть в следующую сверку балансов
+            self._touch_accounts(cur, {account_id for account_id, _ in changes})
+        except BaseException:
+            self.conn.rollback()
+            raise
+        else:
+            self.conn.commit()
+        finally:
+            self._pending_changes = None
+        if changes:
+            self._notify_write(changes)
+
+    # Увеличивает ревизию счетов, чтобы reconcile_balances проверила их заново
+    @staticmethod
+    def _touch_accounts(cur, account_ids):
+        cur.executemany("UPDATE accounts SET revision = revision + 1 WHERE id = ?", [(a,) for a in account_ids])
+
+    # Соединение для выборки: из пула читателей, а внутри transaction() — соединение записи,
+    # чтобы были видны ещё не зафиксированные изменения.
+    # schemas — части базы, из которых читается запрос (см. _partitions): "main" — текущая база,
+    # "archive_<год>" — архивы, которые подключаются к соединению читателя только на время нужды
+    # (внутри транзакции подключать базы нельзя, поэтому архивы всегда читаются из пула).
+    @contextmanager
+    def _reader(self, schemas=("main",)):
+        schemas = tuple(schemas)
+        if self.conn.in_transaction and schemas == ("main",):
+            yield self.conn
+            return
+        with self.connections.reader() as conn:
+            if schemas != ("main",):
+                self._attach_partitions(conn, schemas)
+            yield conn
+
+    # Подключает к соединению архивы из schemas (только для чтения) и пересоздаёт временные
+    # представления transactions_all и daily_balances_all — объединение (UNION ALL) этих частей.
+    # Архивы, не нужные запросу, отключаются, чтобы не упереться в ARCHIVE_ATTACH_LIMIT.
+    def _attach_partitions(self, conn, schemas):
+        if getattr(conn, "partitions", None) == schemas:
+            return
+        attached = {r[1] for r in conn.execute("PRAGMA database_list")} - {"main", "temp"}
+        for name in attached - set(schemas):
+            conn.execute(f"DETACH DATABASE {name}")
+        for name in schemas:
+            if name != "main" and name not in attached:
+                uri = self._archive_path(int(name.split("_")[1])).resolve().as_uri() + "?mode=ro"
+                conn.execute(f"ATTACH DATABASE ? AS {name}", (uri,))
+        for table, columns in PARTITIONED_TABLES.items():
+            parts = []
+            for name in schemas:
+                part = f"SELECT {columns} FROM {name}.{table}"
+                if name != "main":
+                    # Строки удалённых счетов остаются в архиве, но не показываются
+                    part += " WHERE account_id IN (SELECT id FROM main.accounts)"
+                parts.append(part)
+            conn.execute(f"DROP VIEW IF EXISTS temp.{table}_all")
+            conn.execute(f"CREATE TEMP VIEW {table}_all AS " + " UNION ALL ".join(parts))
+        conn.partitions = schemas
+
+    # Имя таблицы (или представления над частями) для запроса к schemas
+    @staticmethod
+    def _source(schemas, table):
+        return table if tuple(schemas) == ("main",) else f"temp.{table}_all"
+
+    # Части базы, из которых читается период (границы включительно, None — без границы):
+    # архивные годы, которые он захватывает, и текущая база. Части идут по возрастанию дат
+    # окнами не больше ARCHIVE_ATTACH_LIMIT — столько баз можно подключить к одному соединению.
+    # Пока архивов нет, это одно окно ("main",), и запросы идут к таблицам текущей базы.
+    def _partitions(self, date_from=None, date_to=None):
+        schemas = [f"archive_{year}" for year in self.archived_years(date_from, date_to)] + ["main"]
+        return [tuple(schemas[i:i + ARCHIVE_ATTACH_LIMIT]) for i in range(0, len(schemas), ARCHIVE_ATTACH_LIMIT)]
+
+    # Файл архива года
+    def _archive_path(self, year):
+        return self.path.parent / ARCHIVE_DIR_NAME / f"{self.path.stem}_{year}.db"
+
+    # Архивные годы по возрастанию; date_from/date_to оставляют только годы, пересекающие период
+    def archived_years(self, date_from=None, date_to=None):
+        q = "SELECT year FROM archives"
+        conditions = []
+        params = []
+        if date_from is not None:
+            conditions.append("year >= ?")
+            params.append(int(date_from[:4]))
+        if date_to is not None:
+            conditions.append("year <= ?")
+            params.append(int(date_to[:4]))
+        if conditions:
+            q += " WHERE " + " AND ".join(conditions)
+        q += " ORDER BY year"
+        with self._reader() as conn:
+            return [r[0] for r in conn.execute(q, params)]
+
+    # Начало открытого для записи периода: более ранние даты перенесены в архив и не изменяются.
+    # Пустая строка — архива нет (любая дата больше неё).
+    @staticmethod
+    def _open_since(cur):
+        year = cur.execute("SELECT MAX(year) FROM archives").fetchone()[0]
+        return str(year + 1) if year is not None else ""
+
+    @staticmethod
+    def _check_open_date(date, open_since):
+        if date < open_since:
+            raise ValueError(f"Транзакции до {open_since} года перенесены в архив, добавлять в этот период нельзя")
+
+    # Переносит транзакции закрытого года в отдельный файл архива (archive/<имя базы>_<год>.db)
+    # вместе с их дневными итогами и поисковым индексом. Архивировать можно только самый ранний
+    # год текущей части, поэтому в основной базе всегда остаются самые новые транзакции.
+    # Сначала архив полностью записывается во временный файл и переименовывается, и только потом
+    # одной транзакцией основной базы год регистрируется в archives, суммы переносятся
+    # в opening_balance счетов и строки удаляются. При сбое между шагами данные остаются
+    # в основной базе, а повторный вызов перезапишет недописанный архив.
+    # Видимые данные не меняются, поэтому подписчики на запись не уведомляются.
+    # Возвращает число перенесённых транзакций.
+    def archive_year(self, year):
+        if self.connections.memory:
+            raise ValueError("Архив доступен только для базы в файле")
+        year = int(year)
+        if year >= datetime.date.today().year:
+            raise ValueError(f"{year} год ещё не закрыт")
+        first = self.conn.execute("SELECT MIN(date) FROM transactions").fetchone()[0]
+        if first is None or first >= str(year + 1):
+            return 0
+        if first < str(year):
+            raise ValueError(f"Сначала нужно архивировать {first[:4]} год")
+
+        period = (str(year), str(year + 1))
+        path = self._archive_path(year)
+        path.parent.mkdir(parents=True, exist_ok=True)
+        tmp = path.with_suffix(".tmp")
+        if tmp.exists():
+            tmp.unlink()
+
+        cur = self.conn.cursor()
+        cur.execute("ATTACH DATABASE ? AS archive_new", (str(tmp),))
+        try:
+            # Архив только читается, журнал WAL ему не нужен
+            cur.execute("PRAGMA archive_new.journal_mode = DELETE").fetchall()
+            with self.transaction() as cur:
+                self._create_archive_tables(cur, "archive_new")
+                cur.execute('''
+                    INSERT INTO archive_new.transactions(id, date, account_id, category, amount, comment, receipt_hash)
+                    SELECT id, date, account_id, category, amount, comment, receipt_hash
+                    FROM transactions WHERE date >= ? AND date < ?
+                    ORDER BY date, id
+                ''', period)
+                count = cur.rowcount
+                cur.execute('''
+                    INSERT INTO archive_new.daily_balances(account_id, date, delta, running_balance)
+                    SELECT account_id, date, delta, running_balance
+                    FROM daily_balances WHERE date >= ? AND date < ?
+                ''', period)
+                cur.execute('''
+                    INSERT INTO archive_new.transactions_fts(rowid, date, account, category, comment)
+                    SELECT rowid, date, account, category, comment FROM main.transactions_fts
+                    WHERE rowid IN (SELECT id FROM archive_new.transactions)
+                ''')
+                # Архив больше не меняется — индекс сливается в один сегмент
+                cur.execute("INSERT INTO archive_new.transactions_fts(transactions_fts) VALUES ('optimize')")
+        finally:
+            self.conn.execute("DETACH DATABASE archive_new")
+        os.replace(tmp, path)
+
+        with self.transaction() as cur:
+            cur.execute("INSERT INTO archives(year, transactions) VALUES (?, ?)", (year, count))
+            # Сумма транзакций текущей части меняется — счета сверяются заново
+            self._touch_accounts(cur, [r[0] for r in cur.execute(
+                "SELECT DISTINCT account_id FROM transactions WHERE date >= ? AND date < ?", period
+            ).fetchall()])
+            cur.execute('''
+                UPDATE accounts SET opening_balance = opening_balance + (
+                    SELECT COALESCE(SUM(amount), 0) FROM transactions
+                    WHERE account_id = accounts.id AND date >= ? AND date < ?
+                )
+            ''', period)
+            cur.execute('''
+                INSERT OR IGNORE INTO archived_receipts(hash)
+                SELECT DISTINCT receipt_hash FROM transactions
+                WHERE date >= ? AND date < ? AND receipt_hash IS NOT NULL
+            ''', period)
+            cur.execute("DELETE FROM daily_balances WHERE date >= ? AND date < ?", period)
+            cur.execute("DELETE FROM transactions WHERE date >= ? AND date < ?", period)
+        return count
+
+    # Архивирует по очереди все годы, кроме последних keep (включая текущий).
+    # progress(archived) вызывается после каждого года; если он вернёт False, архивирование
+    # останавливается (уже перенесённые годы остаются в архиве). Возвращает число перенесённых транзакций.
+    def archive_closed_years(self, keep=ARCHIVE_KEEP_YEARS, progress=None):
+        first = self.conn.execute("SELECT MIN(date) FROM transactions").fetchone()[0]
+        if first is None:
+            return 0
+        archived = 0
+        for year in range(int(first[:4]), datetime.date.today().year - keep + 1):
+            archived += self.archive_year(year)
+            if progress is not None and progress(archived) is False:
+                break
+        return archived
 
     # Добавление нового счёта
     def add_account(self, name, balance=0):
-        cur = self.conn.cursor()
-        cur.execute('INSERT INTO accounts(name,balance) VALUES(?,?)', (name, balance))
-        self.conn.commit()
+        with self.transaction() as cur:
+            balance = to_cents(balance)
+            cur.execute('INSERT INTO accounts(name,balance,initial_balance) VALUES(?,?,?)', (name, balance, balance))
+            self._notify_write({(cur.lastrowid, None)})
 
     # Возвращает список всех счетов
     def list_accounts(self):
-        return self.conn.execute('SELECT * FROM accounts').fetchall()
+        with self._reader() as conn:
+            return conn.execute('SELECT id, name, balance AS "balance [money]" FROM accounts').fetchall()
 
     # Обновляет баланс счёта
     def update_account_balance(self, account_id, delta):
-        cur = self.conn.cursor()
-        cur.execute("UPDATE accounts SET balance = balance + ? WHERE id = ?", (delta, account_id))
-        self.conn.commit()
+        with self.transaction() as cur:
+            cur.execute("UPDATE accounts SET balance = balance + ? WHERE id = ?", (to_cents(delta), account_id))
+            self._notify_write({(account_id, None)})
 
     # Добавляет новую транзакцию в базу данных
     def add_transaction(self, date, account_id, category, amount, comment, photo_file=None):
-        photo_data = None
+        amount = to_cents(amount)
+        receipt = None
         if photo_file:
             with open(photo_file, "rb") as f:
-                photo_data = f.read()
-        cur = self.conn.cursor()
-        cur.execute(
-            "INSERT INTO transactions(date, account_id, category, amount, comment, photo) VALUES (?, ?, ?, ?, ?, ?)",
-            (date, account_id, category, amount, comment, photo_data)
-        )
-        self.conn.commit()
+                receipt = f.read()
+        with self.transaction() as cur:
+            self._check_open_date(date, self._open_since(cur))
+            receipt_hash = self._store_receipt(cur, receipt) if receipt else None
+            cur.execute(
+                "INSERT INTO transactions(date, account_id, category, amount, comment, receipt_hash) VALUES (?, ?, ?, ?, ?, ?)",
+                (date, account_id, category, amount, comment, receipt_hash)
+            )
+            self._apply_daily_delta(cur, account_id, date, amount)
+            self._notify_write({(account_id, date[:7])})
+
+    # Импортирует транзакции из итератора кортежей (date, account_name, category, amount, comment).
+    # Строки пишутся пачками по chunk_size через executemany, каждая пачка — одна транзакция базы;
+    # балансы счетов и daily_balances обновляются один раз на счёт за пачку.
+    # Недостающие счета создаются с нулевым балансом в транзакции своей пачки, поэтому при ошибке
+    # (неверная строка выписки, дата в архивном году) база остаётся без незафиксированных изменений,
+    # а уже записанные пачки сохраняются.
+    # progress(imported) вызывается после каждой пачки; если он вернёт False, импорт прерывается
+    # (уже записанные пачки остаются). Возвращает число импортированных строк.
+    # Около половины времени записи уходит на поисковый индекс FTS5 (разбор на слова и префиксы),
+    # остальное — на вставку в таблицу и её индексы: импортированные строки сразу доступны поиску.
+    def import_transactions(self, rows, chunk_size=IMPORT_CHUNK_SIZE, progress=None):
+        with self._reader() as conn:
+            account_ids = {r["name"]: r["id"] for r in conn.execute("SELECT id, name FROM accounts")}
+            open_since = self._open_since(conn)
+        imported = 0
+        chunk = []
+        for date, account, category, amount, comment in rows:
+            self._check_open_date(date, open_since)
+            chunk.append((date, account, category, to_cents(amount), comment))
+            if len(chunk) >= chunk_size:
+                self._import_chunk(chunk, account_ids)
+                imported += len(chunk)
+                chunk = []
+                if progress is not None and progress(imported) is False:
+                    return imported
+        if chunk:
+            self._import_chunk(chunk, account_ids)
+            imported += len(chunk)
+            if progress is not None:
+                progress(imported)
+        return imported
 
-    # Возвращает список всех транзакций с указанием счёта и категории
+    # Записывает пачку строк (date, account_name, category, cents, comment) одной транзакцией.
+    # account_ids — {имя: id} известных счетов; созданные счета добавляются в него после фиксации.
+    def _import_chunk(self, chunk, account_ids):
+        # Явная транзакция: иначе DROP TRIGGER выполнился бы вне неё и не откатился бы при ошибке
+        with self.transaction() as cur:
+            created = {}
+            for name in {account for _, account, _, _, _ in chunk}:
+                if name not in account_ids:
+                    cur.execute("INSERT INTO accounts(name, balance) VALUES (?, 0)", (name,))
+                    created[name] = cur.lastrowid
+            ids = {**account_ids, **created}
+            chunk = [(date, ids[account], category, amount, comment)
+                     for date, account, category, amount, comment in chunk]
+            deltas = {}
+            first_dates = {}
+            for date, account_id, _, amount, _ in chunk:
+                deltas[account_id] = deltas.get(account_id, 0) + amount
+                if date < first_dates.get(account_id, "9999"):
+                    first_dates[account_id] = date
+            # Построчный триггер FTS на массовой вставке в разы медленнее одной вставки INSERT ... SELECT,
+            # поэтому на время пачки он снимается (в той же транзакции базы)
+            last_id = cur.execute("SELECT COALESCE(MAX(id), 0) FROM transactions").fetchone()[0]
+            cur.execute("DROP TRIGGER transactions_fts_insert")
+            cur.executemany(
+                "INSERT INTO transactions(date, account_id, category, amount, comment) VALUES (?, ?, ?, ?, ?)",
+                chunk
+            )
+            cur.execute('''
+                INSERT INTO transactions_fts(rowid, date, account, category, comment)
+                SELECT t.id, t.date, a.name, t.category, t.comment
+                FROM transactions t
+                JOIN accounts a ON a.id = t.account_id
+                WHERE t.id > ?
+            ''', (last_id,))
+            self._create_fts_insert_trigger(cur)
+            cur.executemany(
+                "UPDATE accounts SET balance = balance + ? WHERE id = ?",
+                [(delta, account_id) for account_id, delta in deltas.items()]
+            )
+            for account_id, date in first_dates.items():
+                self._rebuild_daily_balances(cur, account_id, date)
+            changes = {(account_id, date[:7]) for date, account_id, _, _, _ in chunk}
+            changes.update((account_id, None) for account_id in deltas)
+            self._notify_write(changes)
+        account_ids.update(created)
+
+    # Пересчитывает daily_balances счёта начиная с даты since (для массовых изменений,
+    # где построчное обновление через _apply_daily_delta обходилось бы дороже).
+    # До первого дня текущей части накоплена сумма, перенесённая в архив (opening_balance).
+    @staticmethod
+    def _rebuild_daily_balances(cur, account_id, since):
+        cur.execute("DELETE FROM daily_balances WHERE account_id = ? AND date >= ?", (account_id, since))
+        cur.execute('''
+            INSERT INTO daily_balances(account_id, date, delta, running_balance)
+            SELECT account_id, date, SUM(amount),
+                   COALESCE((SELECT running_balance FROM daily_balances
+                             WHERE account_id = ? AND date < ? ORDER BY date DESC LIMIT 1),
+                            (SELECT opening_balance FROM accounts WHERE id = ?))
+                   + SUM(SUM(amount)) OVER (ORDER BY date)
+            FROM transactions
+            WHERE account_id = ? AND date >= ?
+            GROUP BY date
+        ''', (account_id, since, account_id, account_id, since))
+
+    # Возвращает список всех транзакций (включая архивные) с указанием счёта и категории.
+    # Сами фото не читаются — только признак has_photo.
     def list_transactions(self):
         q = """
-        SELECT t.id, t.date, a.name as account, t.category, t.amount, t.comment, t.photo
-        FROM transactions t
+        SELECT t.id, t.date, a.name as account, t.category, t.amount AS "amount [money]", t.comment,
+               t.receipt_hash IS NOT NULL as has_photo
+        FROM {transactions} t
         JOIN accounts a ON a.id = t.account_id
         """
-        return self.conn.execute(q).fetchall()
+        rows = []
+        for schemas in self._partitions():
+            with self._reader(schemas) as conn:
+                rows.extend(conn.execute(q.format(transactions=self._source(schemas, "transactions"))).fetchall())
+        return rows
+
+    # Возвращает одну страницу транзакций (от новых к старым) вместе с миниатюрами фото чеков.
+    # after — ключ (date, id) последней строки предыдущей страницы, None — первая страница.
+    # search — строка поиска; совпадения ищутся в индексе transactions_fts.
+    # Выборка идёт по индексу, поэтому время не зависит от размера таблицы.
+    # Страница набирается сначала из текущей базы, и только если строк в ней не хватило —
+    # из архивов по одному году, от новых к старым (годы не пересекаются по датам).
+    def list_transactions_page(self, after=None, limit=200, search=None):
+        q = """
+        SELECT t.id, t.date, a.name as account, t.category, t.amount AS "amount [money]", t.comment,
+               t.receipt_hash IS NOT NULL as has_photo, t.receipt_hash, th.data as thumbnail
+        FROM {schema}.transactions t
+        JOIN main.accounts a ON a.id = t.account_id
+        LEFT JOIN main.receipt_thumbnails th ON th.hash = t.receipt_hash
+        """
+        conditions = []
+        params = []
+        match = self._search_query(search) if search else None
+        if match:
+            # Унарный плюс не даёт планировщику идти от совпадений поиска: иначе он выбирает
+            # все совпадения (у частого префикса — сотни тысяч) и сортирует их ради одной страницы.
+            # Так строки читаются по индексу дат от новых к старым, а совпадения собираются
+            # один раз в список для проверки, и выборка останавливается на limit строках.
+            conditions.append("+t.id IN (SELECT rowid FROM {schema}.transactions_fts WHERE transactions_fts MATCH ?)")
+            params.append(match)
+        if after is not None:
+            conditions.append("(t.date, t.id) < (?, ?)")
+            params.extend(after)
+        if conditions:
+            q += " WHERE " + " AND ".join(conditions)
+        q += " ORDER BY t.date DESC, t.id DESC LIMIT ?"
+
+        # Архивы новее последней строки предыдущей страницы пропускаются
+        years = self.archived_years(date_to=after[0] if after is not None else None)
+        rows = []
+        for schema in ["main"] + [f"archive_{year}" for year in reversed(years)]:
+            with self._reader((schema,)) as conn:
+                rows.extend(conn.execute(q.format(schema=schema), params + [limit - len(rows)]).fetchall())
+            if len(rows) >= limit:
+                break
+        return rows
+
+    # Потоково возвращает транзакции (от старых к новым) с фильтрами по датам (включительно),
+    # счёту и категории. Строки читаются из курсора пачками через fetchmany,
+    # поэтому в памяти одновременно не больше chunk_size строк. Фото не читаются.
+    # Архивы подключаются, только если период захватывает архивные годы.
+    def iter_transactions(self, date_from=None, date_to=None, account_id=None, category=None,
+                          chunk_size=FETCH_CHUNK_SIZE):
+        q = """
+        SELECT t.id, t.date, a.name as account, t.category, t.amount AS "amount [money]", t.comment,
+               t.receipt_hash
+        FROM {transactions} t
+        JOIN accounts a ON a.id = t.account_id
+        """
+        conditions = []
+        params = []
+        if date_from is not None:
+            conditions.append("t.date >= ?")
+            params.append(date_from)
+        if date_to is not None:
+            conditions.append("t.date <= ?")
+            params.append(date_to)
+        if account_id is not None:
+            conditions.append("t.account_id = ?")
+            params.append(account_id)
+        if category is not None:
+            conditions.append("t.category = ?")
+            params.append(category)
+        if conditions:
+            q += " WHERE " + " AND ".join(conditions)
+        q += " ORDER BY t.date, t.id"
+
+        for schemas in self._partitions(date_from, date_to):
+            with self._reader(schemas) as conn:
+                cur = conn.execute(q.format(transactions=self._source(schemas, "transactions")), params)
+                while True:
+                    rows = cur.fetchmany(chunk_size)
+                    if not rows:
+                        break
+                    yield from rows
+
+    # Потоково возвращает транзакции для расчётов в NumPy: пачки (списки) кортежей
+    # (date, account_id, category, amount), сумма — целые копейки. Фильтры как у iter_transactions.
+    def iter_transaction_values(self, date_from=None, date_to=None, account_id=None, category=None,
+                                chunk_size=FETCH_CHUNK_SIZE):
+        q = "SELECT date, account_id, category, amount FROM {transactions}"
+        conditions = []
+        params = []
+        if date_from is not None:
+            conditions.append("date >= ?")
+            params.append(date_from)
+        if date_to is not None:
+            conditions.append("date <= ?")
+            params.append(date_to)
+        if account_id is not None:
+            conditions.append("account_id = ?")
+            params.append(account_id)
+        if category is not None:
+            conditions.append("category = ?")
+            params.append(category)
+        if conditions:
+            q += " WHERE " + " AND ".join(conditions)
+
+        for schemas in self._partitions(date_from, date_to):
+            with self._reader(schemas) as conn:
+                cur = conn.cursor()
+                # Без sqlite3.Row: кортежи создаются быстрее и сразу подходят для NumPy
+                cur.row_factory = None
+                cur.execute(q.format(transactions=self._source(schemas, "transactions")), params)
+                while True:
+                    rows = cur.fetchmany(chunk_size)
+                    if not rows:
+                        break
+                    yield rows
+
+    # Итоги транзакций для отчётов, сгруппированные по полям group_by (из TOTALS_GROUPS:
+    # "month" — 'YYYY-MM', "category", "account" — id счёта). Группировка выполняется в SQLite
+    # одним запросом. Строки: значения полей, затем income, expense (≤ 0) и count; суммы в копейках.
+    def transaction_totals(self, group_by, date_from=None, date_to=None, account_id=None):
+        keys = [TOTALS_GROUPS[field] for field in group_by]
+        q = f"""
+        SELECT {", ".join(keys)},
+               SUM(CASE WHEN amount > 0 THEN amount ELSE 0 END) as income,
+               SUM(CASE WHEN amount < 0 THEN amount ELSE 0 END) as expense,
+               COUNT(*) as count
+        FROM {{transactions}}
+        """
+        conditions = []
+        params = []
+        if date_from is not None:
+            conditions.append("date >= ?")
+            params.append(date_from)
+        if date_to is not None:
+            conditions.append("date <= ?")
+            params.append(date_to)
+        if account_id is not None:
+            conditions.append("account_id = ?")
+            params.append(account_id)
+        if conditions:
+            q += " WHERE " + " AND ".join(conditions)
+        q += f" GROUP BY {', '.join(keys)} ORDER BY {', '.join(keys)}"
+        partitions = self._partitions(date_from, date_to)
+        rows = []
+        for schemas in partitions:
+            with self._reader(schemas) as conn:
+                cur = conn.cursor()
+                cur.row_factory = None
+                rows.extend(cur.execute(q.format(transactions=self._source(schemas, "transactions")), params))
+        if len(partitions) == 1:
+            return rows
+        # Период прочитан несколькими окнами: одинаковые группы из разных окон складываются
+        totals = {}
+        for row in rows:
+            key = row[:len(keys)]
+            income, expense, count = totals.get(key, (0, 0, 0))
+            totals[key] = (income + row[-3], expense + row[-2], count + row[-1])
+        return [key + values for key, values in sorted(totals.items())]
+
+    # Потоково возвращает дневные итоги счетов из daily_balances (для отчётов), по счетам и датам.
+    # Если период читается несколькими окнами архивов, этот порядок соблюдается внутри каждого окна.
+    def iter_daily_balances(self, date_from=None, date_to=None, account_id=None, chunk_size=FETCH_CHUNK_SIZE):
+        q = """
+        SELECT a.name as account, d.date, d.delta AS "delta [money]",
+               d.running_balance AS "running_balance [money]"
+        FROM {daily_balances} d
+        JOIN accounts a ON a.id = d.account_id
+        """
+        conditions = []
+        params = []
+        if date_from is not None:
+            conditions.append("d.date >= ?")
+            params.append(date_from)
+        if date_to is not None:
+            conditions.append("d.date <= ?")
+            params.append(date_to)
+        if account_id is not None:
+            conditions.append("d.account_id = ?")
+            params.append(account_id)
+        if conditions:
+            q += " WHERE " + " AND ".join(conditions)
+        q += " ORDER BY d.account_id, d.date"
+
+        for schemas in self._partitions(date_from, date_to):
+            with self._reader(schemas) as conn:
+                cur = conn.execute(q.format(daily_balances=self._source(schemas, "daily_balances")), params)
+                while True:
+                    rows = cur.fetchmany(chunk_size)
+                    if not rows:
+                        break
+                    yield from rows
+
+    # Возвращает содержимое фото чека по его хэшу (для экспорта и просмотра)
+    def get_receipt(self, receipt_hash):
+        with self._reader() as conn:
+            row = conn.execute("SELECT data FROM receipts WHERE hash=?", (receipt_hash,)).fetchone()
+        return row["data"] if row else None
+
+    # Возвращает до limit чеков без миниатюр: строки (hash, data)
+    def receipts_without_thumbnails(self, limit=16):
+        with self._reader() as conn:
+            return conn.execute('''
+                SELECT r.hash, r.data FROM receipts r
+                WHERE NOT EXISTS (SELECT 1 FROM receipt_thumbnails th WHERE th.hash = r.hash)
+                LIMIT ?
+            ''', (limit,)).fetchall()
+
+    # Хэши всех чеков; missing_thumbnails=True — только чеков, для которых ещё нет миниатюр
+    def receipt_hashes(self, missing_thumbnails=False):
+        q = "SELECT hash FROM receipts r"
+        if missing_thumbnails:
+            q += " WHERE NOT EXISTS (SELECT 1 FROM receipt_thumbnails th WHERE th.hash = r.hash)"
+        with self._reader() as conn:
+            return [r[0] for r in conn.execute(q)]
+
+    # Сохраняет миниатюры: thumbnails — пары (hash, data), data = None — миниатюры не будет.
+    # Миниатюра чека, удалённого пока она строилась, не сохраняется.
+    def store_thumbnails(self, thumbnails):
+        with self.transaction() as cur:
+            cur.executemany('''
+                INSERT OR REPLACE INTO receipt_thumbnails(hash, data)
+                SELECT ?1, ?2 WHERE EXISTS (SELECT 1 FROM receipts WHERE hash = ?1)
+            ''', thumbnails)
+
+    # Возвращает дневные точки графика баланса счёта за период (границы включительно, None — без границы).
+    # Баланс дня = текущий баланс счёта - сумма всех транзакций + накопленный итог по этот день.
+    # Сумма всех транзакций — последний накопленный итог текущей части, а если в ней нет дней
+    # счёта — сумма, перенесённая в архив. Архивные годы периода читаются из файлов архива.
+    # Читается диапазон первичного ключа daily_balances, без обхода транзакций.
+    # Суммы — целые копейки (delta_cents, balance_cents), чтобы ряд сразу ложился в массив int64;
+    # running_cents — сам накопленный итог транзакций (для сверки).
+    def daily_balance_series(self, account_id, date_from=None, date_to=None):
+        q = """
+        SELECT d.date, d.delta as delta_cents, d.running_balance as running_cents,
+               a.balance - COALESCE((SELECT running_balance FROM main.daily_balances
+                                     WHERE account_id = a.id ORDER BY date DESC LIMIT 1), a.opening_balance)
+                         + d.running_balance as balance_cents
+        FROM {daily_balances} d
+        JOIN accounts a ON a.id = d.account_id
+        WHERE d.account_id = ?
+        """
+        params = [account_id]
+        if date_from is not None:
+            q += " AND d.date >= ?"
+            params.append(date_from)
+        if date_to is not None:
+            q += " AND d.date <= ?"
+            params.append(date_to)
+        q += " ORDER BY d.date"
+        rows = []
+        for schemas in self._partitions(date_from, date_to):
+            with self._reader(schemas) as conn:
+                rows.extend(conn.execute(q.format(daily_balances=self._source(schemas, "daily_balances")), params))
+        return rows
+
+    # Сверяет балансы счетов с журналом: balance должен быть равен initial_balance + opening_balance
+    # + сумма транзакций текущей части. Суммы по счетам считаются одним сгруппированным запросом.
+    # Проверяются только счета, изменённые после их последней успешной сверки (ревизия не совпадает
+    # с account_checks) или ещё ни разу не сверенные; full=True проверяет все счета и для
+    # неизменённых сравнивает число, сумму и контрольную сумму транзакций с запомненными —
+    # так находятся правки журнала в обход программы.
+    # Сошедшиеся счета запоминаются в account_checks, поэтому счёт с расхождением проверяется
+    # при каждом запуске, пока его не исправят. Всё читается в одной транзакции, то есть
+    # балансы и суммы согласованы между собой.
+    # Возвращает словари по проверенным счетам: account_id, name, balance_cents, expected_cents,
+    # drift_cents (balance - expected), transactions, journal_changed (журнал изменён в обход программы).
+    def reconcile_balances(self, full=False):
+        with self.transaction() as cur:
+            where = "" if full else "WHERE c.revision IS NULL OR c.revision != a.revision"
+            accounts = cur.execute(f'''
+                SELECT a.id, a.name, a.balance, a.initial_balance + a.opening_balance as base, a.revision,
+                       c.revision as checked_revision, c.transactions as checked_transactions,
+                       c.total as checked_total, c.checksum as checked_checksum
+                FROM accounts a
+                LEFT JOIN account_checks c ON c.account_id = a.id
+                {where}
+            ''').fetchall()
+            if not accounts:
+                return []
+
+            q = """
+            SELECT account_id, COUNT(*), SUM(amount),
+                   SUM(((id * ?1 + amount * ?2) % ?3) * ((id * ?1 + amount * ?2) % ?3) % ?3)
+            FROM transactions
+            """
+            if not full:
+                q += f"""
+                WHERE account_id IN (SELECT a.id FROM accounts a
+                                     LEFT JOIN account_checks c ON c.account_id = a.id {where})
+                """
+            q += " GROUP BY account_id"
+            sums = {
+                r[0]: r[1:] for r in cur.execute(q, (CHECKSUM_ID_FACTOR, CHECKSUM_AMOUNT_FACTOR, CHECKSUM_MODULUS))
+            }
+
+            results = []
+            checked = []
+            for a in accounts:
+                count, total, checksum = sums.get(a["id"], (0, 0, 0))
+                expected = a["base"] + total
+                journal_changed = a["checked_revision"] == a["revision"] and (
+                    a["checked_transactions"], a["checked_total"], a["checked_checksum"]
+                ) != (count, total, checksum)
+                results.append({
+                    "account_id": a["id"],
+                    "name": a["name"],
+                    "balance_cents": a["balance"],
+                    "expected_cents": expected,
+                    "drift_cents": a["balance"] - expected,
+                    "transactions": count,
+                    "journal_changed": journal_changed,
+                })
+                if a["balance"] == expected and not journal_changed:
+                    checked.append((a["id"], a["revision"], count, total, checksum))
+            cur.executemany('''
+                INSERT OR REPLACE INTO account_checks(account_id, revision, transactions, total, checksum)
+                VALUES (?, ?, ?, ?, ?)
+            ''', checked)
+        return results
+
+    # Исправляет балансы счетов по журналу: balance = initial_balance + opening_balance
+    # + сумма транзакций. Журнал считается верным; исправленные счета проверит следующая сверка.
+    def repair_balances(self, account_ids):
+        account_ids = list(account_ids)
+        with self.transaction() as cur:
+            cur.executemany('''
+                UPDATE accounts SET balance = initial_balance + opening_balance
+                    + COALESCE((SELECT SUM(amount) FROM transactions WHERE account_id = accounts.id), 0)
+                WHERE id = ?
+            ''', [(a,) for a in account_ids])
+            self._notify_write({(account_id, None) for account_id in account_ids})
+
+    # Пересчитывает дневные итоги счёта в текущей части базы (архивные годы не меняются)
+    def rebuild_daily_balances(self, account_id):
+        with self.transaction() as cur:
+            self._rebuild_daily_balances(cur, account_id, self._open_since(cur))
+            self._notify_write({(account_id, None)})
+
+    # Проверяет целостность файла базы и всех архивов (PRAGMA integrity_check, для quick=True —
+    # более быстрая quick_check без сверки индексов) и внешние ключи текущей базы.
+    # Возвращает список найденных проблем; пустой список — всё в порядке.
+    def integrity_check(self, quick=False):
+        pragma = "quick_check" if quick else "integrity_check"
+        problems = []
+        for schema in ["main"] + [f"archive_{year}" for year in self.archived_years()]:
+            with self._reader((schema,)) as conn:
+                problems.extend(
+                    f"{schema}: {r[0]}" for r in conn.execute(f"PRAGMA {schema}.{pragma}") if r[0] != "ok"
+                )
+        with self._reader() as conn:
+            problems.extend(
+                f"main: нарушен внешний ключ {r[0]}({r[1]}) -> {r[2]}" for r in conn.execute("PRAGMA foreign_key_check")
+            )
+        return problems
 
     # Освобождает неиспользуемое пространство и уменьшает размер файла базы данных.
+    # Полностью перезаписывает файл — для обычной работы есть incremental_vacuum().
     def vacuum(self):
         self.conn.execute("VACUUM")
         self.conn.commit()
 
-    # Удаляет транзакцию по дате, имени счёта, категории и сумме
-    # После удаления корректирует баланс счёта
-
-    def delete_transaction(self, date, account_name, category, amount):
-        cur = self.conn.cursor()
-        cur.execute("SELECT id FROM accounts WHERE name=?", (account_name,))
-        acc = cur.fetchone()
-        if not acc:
-            raise ValueError("Счёт не найден")
-        account_id = acc["id"]
-
-        cur.execute("""
-            DELETE FROM transactions
-            WHERE date=? AND account_id=? AND category=? AND amount=?
-        """, (date, account_id, category, amount))
+    # Возвращает файловой системе часть свободных страниц, если их накопилось больше порога.
+    # Вызывается в простое, поэтому каждый вызов ограничен max_pages страницами.
+    # Возвращает True, если свободные страницы ещё остались.
+    def incremental_vacuum(self, min_free_pages=VACUUM_MIN_FREE_PAGES, max_pages=VACUUM_STEP_PAGES):
+        free = self.conn.execute("PRAGMA freelist_count").fetchone()[0]
+        if free < min_free_pages:
+            return False
+        self.conn.execute(f"PRAGMA incremental_vacuum({int(max_pages)})").fetchall()
         self.conn.commit()
-        self.update_account_balance(account_id, -amount)
+        return free > max_pages
 
-        # После удаления очищаем базу
-        self.vacuum()
+    # Удаляет транзакцию по id и в той же транзакции базы корректирует баланс счёта
+    def delete_transaction(self, tx_id):
+        with self.transaction() as cur:
+            tx = cur.execute(
+                "SELECT date, account_id, amount, receipt_hash FROM transactions WHERE id=?", (tx_id,)
+            ).fetchone()
+            if not tx:
+                raise ValueError("Транзакция не найдена или перенесена в архив (архив только для чтения)")
 
-    # Извлекает фото из транзакции (если оно есть)
-    def get_transaction_photo(self, date, account_name, category, amount):
-        cur = self.conn.cursor()
-        cur.execute("""
-            SELECT t.photo FROM transactions t
-            JOIN accounts a ON a.id = t.account_id
-            WHERE t.date=? AND a.name=? AND t.category=? AND t.amount=?
-        """, (date, account_name, category, amount))
-        row = cur.fetchone()
-        if row and row["photo"]:
-            import tempfile
-            tmp_file = tempfile.NamedTemporaryFile(delete=False, suffix=".png")
-            tmp_file.write(row["photo"])
-            tmp_file.close()
-            return tmp_file.name
-        return None
+            cur.execute("DELETE FROM transactions WHERE id=?", (tx_id,))
+            self._drop_unused_receipts(cur, [tx["receipt_hash"]])
+            self._apply_daily_delta(cur, tx["account_id"], tx["date"], -tx["amount"])
+            cur.execute("UPDATE accounts SET balance = balance - ? WHERE id = ?", (tx["amount"], tx["account_id"]))
+            self._notify_write({(tx["account_id"], tx["date"][:7]), (tx["account_id"], None)})
+
+    # Удаляет счёт вместе со всеми его транзакциями одной транзакцией базы данных
+    def delete_account(self, account_id):
+        with self.transaction() as cur:
+            hashes = [
+                r["receipt_hash"] for r in cur.execute(
+                    "SELECT DISTINCT receipt_hash FROM transactions WHERE account_id=? AND receipt_hash IS NOT NULL",
+                    (account_id,)
+                )
+            ]
+            # Месяцы, в которых были транзакции счёта, — для сброса кэшей отчётов
+            changes = {
+                (account_id, r[0]) for r in cur.execute(
+                    "SELECT DISTINCT substr(date, 1, 7) FROM transactions WHERE account_id=?", (account_id,)
+                )
+            }
+            # Месяцы архивных лет без подключения архивов неизвестны — сбрасываются все
+            for (year,) in cur.execute("SELECT year FROM archives").fetchall():
+                changes.update((account_id, f"{year}-{month:02d}") for month in range(1, 13))
+            changes.add((account_id, None))
+            # Транзакции счёта удаляются каскадно (внешний ключ ON DELETE CASCADE);
+            # архивные остаются в файлах архива, но больше не показываются
+            cur.execute("DELETE FROM accounts WHERE id=?", (account_id,))
+            self._drop_unused_receipts(cur, hashes)
+            self._notify_write(changes)
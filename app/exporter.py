@@ -0,0 +1,80 @@
+import csv
+import gzip
+import json
+from pathlib import Path
+
+from app.receipts import receipt_extension
+
+TRANSACTION_COLUMNS = ["id", "date", "account", "category", "amount", "comment", "receipt"]
+DAILY_BALANCE_COLUMNS = ["account", "date", "delta", "running_balance"]
+
+
+# Формат определяется по расширению: .csv, .jsonl, а также .csv.gz и .jsonl.gz
+def _detect_format(path):
+    suffixes = [s.lower() for s in Path(path).suffixes]
+    compressed = bool(suffixes) and suffixes[-1] == ".gz"
+    if compressed:
+        suffixes = suffixes[:-1]
+    fmt = "jsonl" if suffixes and suffixes[-1] in (".jsonl", ".json") else "csv"
+    return fmt, compressed
+
+
+def _open_output(path, compressed):
+    if compressed:
+        return gzip.open(path, "wt", encoding="utf-8", newline="")
+    return open(path, "w", encoding="utf-8", newline="")
+
+
+# Записывает строки в CSV или JSON Lines по одной, не накапливая их в памяти.
+# progress(written) вызывается каждые progress_every строк; если он вернёт False, запись прерывается.
+# Возвращает число записанных строк.
+def write_rows(rows, columns, path, progress=None, progress_every=10000):
+    fmt, compressed = _detect_format(path)
+    written = 0
+    with _open_output(path, compressed) as f:
+        if fmt == "csv":
+            writer = csv.writer(f)
+            writer.writerow(columns)
+            write = writer.writerow
+        else:
+            def write(values):
+                # Суммы (Decimal) записываются строками: через float большие суммы теряют копейки
+                f.write(json.dumps(dict(zip(columns, values)), ensure_ascii=False, default=str))
+                f.write("\n")
+        for row in rows:
+            write(row)
+            written += 1
+            if progress is not None and written % progress_every == 0 and progress(written) is False:
+                break
+    return written
+
+
+# Экспортирует транзакции в файл (формат — по расширению). Фильтры те же, что у Database.iter_transactions.
+# receipts_dir — папка, куда сохраняются фото чеков (по одному файлу на хэш);
+# в колонке receipt тогда указывается имя файла.
+def export_transactions(db, path, date_from=None, date_to=None, account_id=None, category=None,
+                        receipts_dir=None, progress=None):
+    if receipts_dir is not None:
+        receipts_dir = Path(receipts_dir)
+        receipts_dir.mkdir(parents=True, exist_ok=True)
+    saved = {}
+
+    def rows():
+        for t in db.iter_transactions(date_from, date_to, account_id, category):
+            receipt = t["receipt_hash"]
+            if receipt is not None and receipts_dir is not None:
+                if receipt not in saved:
+                    data = db.get_receipt(receipt)
+                    name = receipt + receipt_extension(data)
+                    (receipts_dir / name).write_bytes(data)
+                    saved[receipt] = name
+                receipt = saved[receipt]
+            yield t["id"], t["date"], t["account"], t["category"], t["amount"], t["comment"], receipt
+
+    return write_rows(rows(), TRANSACTION_COLUMNS, path, progress)
+
+
+# Экспортирует отчёт по дневным итогам счетов (изменение за день и накопленный итог)
+def export_daily_balances(db, path, date_from=None, date_to=None, account_id=None, progress=None):
+    rows = (tuple(r) for r in db.iter_daily_balances(date_from, date_to, account_id))
+    return write_rows(rows, DAILY_BALANCE_COLUMNS, path, progress)
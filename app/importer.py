@@ -0,0 +1,198 @@
+import codecs
+import csv
+import re
+from datetime import datetime
+from decimal import Decimal, InvalidOperation
+from pathlib import Path
+
+# Названия колонок CSV, которые распознаются автоматически (регистр не важен)
+COLUMN_ALIASES = {
+    "date": "date", "дата": "date", "дата операции": "date",
+    "account": "account", "счёт": "account", "счет": "account",
+    "category": "category", "категория": "category",
+    "amount": "amount", "сумма": "amount", "сумма операции": "amount",
+    "comment": "comment", "комментарий": "comment", "описание": "comment", "description": "comment",
+}
+
+DATE_FORMATS = ("%Y-%m-%d", "%d.%m.%Y", "%d/%m/%Y", "%Y%m%d")
+
+OFX_CHUNK_SIZE = 64 * 1024
+OFX_TAG_RE = re.compile(r"<(/?)([A-Za-z0-9.]+)>([^<]*)")
+# Теги, без которых операцию OFX (STMTTRN) не импортировать
+OFX_REQUIRED_TAGS = ("DTPOSTED", "TRNAMT")
+# Заголовок OFX, по которому определяется кодировка: SGML-заголовок OFX 1.x (ENCODING:, CHARSET:)
+# или пролог XML у OFX 2.x
+OFX_HEADER_SIZE = 4096
+OFX_HEADER_RE = re.compile(rb"^\s*(ENCODING|CHARSET)\s*:\s*([A-Za-z0-9_-]+)", re.MULTILINE)
+OFX_XML_ENCODING_RE = re.compile(rb"<\?xml[^>]*?encoding\s*=\s*[\"']([A-Za-z0-9_.-]+)[\"']")
+# Кодировка выписки без указания кодировки в заголовке (так выгружают российские банки)
+OFX_DEFAULT_ENCODING = "cp1251"
+
+
+# Приводит дату выписки к формату базы (YYYY-MM-DD).
+# Частые форматы разбираются срезами строки — strptime на каждую строку слишком медленный.
+def parse_date(value):
+    value = value.strip().split(" ")[0]
+    if len(value) == 10 and value[4] == "-" and value[7] == "-":
+        return value
+    if len(value) == 10 and value[2] == "." and value[5] == ".":
+        return f"{value[6:]}-{value[3:5]}-{value[:2]}"
+    if len(value) == 8 and value.isdigit():
+        return f"{value[:4]}-{value[4:6]}-{value[6:]}"
+    for fmt in DATE_FORMATS:
+        try:
+            return datetime.strptime(value, fmt).strftime("%Y-%m-%d")
+        except ValueError:
+            continue
+    raise ValueError(f"Не удалось распознать дату: {value!r}")
+
+
+# Разбирает сумму вида "-1 234,56" или "1234.56" в Decimal (без потерь на двоичном округлении)
+def parse_amount(value):
+    value = value.strip().replace(" ", "").replace(" ", "").replace(",", ".")
+    try:
+        return Decimal(value)
+    except InvalidOperation:
+        raise ValueError(f"Не удалось распознать сумму: {value!r}") from None
+
+
+# Читает CSV-выписку построчно и возвращает кортежи (date, account, category, amount, comment).
+# Файл не загружается целиком, поэтому расход памяти не зависит от его размера.
+# mapping — {поле: название колонки} для нестандартных заголовков;
+# default_account — счёт для строк, где он не указан.
+def read_csv(path, mapping=None, default_account=None, delimiter=None, encoding="utf-8-sig"):
+    with open(path, newline="", encoding=encoding) as f:
+        if delimiter is None:
+            # В заголовке без разделителей (одна колонка) Sniffer разделитель не находит;
+            # тогда недостающие колонки покажет проверка ниже
+            try:
+                delimiter = csv.Sniffer().sniff(f.readline(), delimiters=",;\t").delimiter
+            except csv.Error:
+                delimiter = ","
+            f.seek(0)
+        reader = csv.reader(f, delimiter=delimiter)
+        header = next(reader, None)
+        if header is None:
+            return
+
+        if mapping:
+            columns = {field: header.index(name) for field, name in mapping.items()}
+        else:
+            columns = {}
+            for i, name in enumerate(header):
+                field = COLUMN_ALIASES.get(name.strip().lower())
+                if field and field not in columns:
+                    columns[field] = i
+        for field in ("date", "amount"):
+            if field not in columns:
+                raise ValueError(f"В CSV нет колонки для поля '{field}'")
+        if "account" not in columns and default_account is None:
+            raise ValueError("В CSV нет колонки со счётом, укажите счёт для импорта")
+
+        # Номера колонок считаются один раз. Отсутствующее поле читается из пустой ячейки,
+        # добавленной в конец строки (номер -1), поэтому в цикле нет проверок на каждую ячейку
+        date_i, amount_i = columns["date"], columns["amount"]
+        account_i, category_i, comment_i = (columns.get(f, -1) for f in ("account", "category", "comment"))
+        padding = [""] * (len(header) + 1)
+
+        for row in reader:
+            if not any(row):
+                continue
+            row += padding[len(row):] if len(row) < len(header) else [""]
+            yield (
+                parse_date(row[date_i]),
+                row[account_i].strip() or default_account,
+                row[category_i].strip(),
+                parse_amount(row[amount_i]),
+                row[comment_i].strip(),
+            )
+
+
+# Разбивает OFX (SGML или XML) на теги (закрывающий, имя, значение), читая файл блоками
+def _ofx_tags(f):
+    buf = ""
+    while True:
+        chunk = f.read(OFX_CHUNK_SIZE)
+        if not chunk:
+            break
+        buf += chunk
+        # Последний тег в блоке может быть неполным — он разбирается вместе со следующим блоком
+        cut = buf.rfind("<")
+        if cut <= 0:
+            continue
+        for m in OFX_TAG_RE.finditer(buf, 0, cut):
+            yield m.group(1) == "/", m.group(2).upper(), m.group(3).strip()
+        buf = buf[cut:]
+    for m in OFX_TAG_RE.finditer(buf):
+        yield m.group(1) == "/", m.group(2).upper(), m.group(3).strip()
+
+
+# Кодировка OFX по началу файла head (байты). OFX 2.x — это XML: кодировка из пролога,
+# без неё — UTF-8. В SGML-заголовке OFX 1.x ENCODING:UTF-8 означает UTF-8, иначе кодировку
+# задаёт CHARSET (номер кодовой страницы Windows или имя). Если в заголовке ничего нет
+# (или CHARSET:NONE), используется OFX_DEFAULT_ENCODING.
+def ofx_encoding(head):
+    if head.startswith(codecs.BOM_UTF8):
+        return "utf-8-sig"
+    m = OFX_XML_ENCODING_RE.search(head)
+    if m:
+        return _known_encoding(m.group(1).decode("ascii")) or "utf-8"
+    if head.lstrip().startswith(b"<?xml"):
+        return "utf-8"
+    header = {name.decode("ascii"): value.decode("ascii").upper() for name, value in OFX_HEADER_RE.findall(head)}
+    if header.get("ENCODING") in ("UTF-8", "UTF8"):
+        return "utf-8"
+    charset = header.get("CHARSET", "NONE")
+    if charset.isdigit():
+        charset = "cp" + charset
+    return _known_encoding(charset) or OFX_DEFAULT_ENCODING
+
+
+# Имя кодировки, если Python её знает, иначе None
+def _known_encoding(name):
+    try:
+        return codecs.lookup(name).name
+    except LookupError:
+        return None
+
+
+# Читает OFX-выписку потоково и возвращает кортежи (date, account, category, amount, comment).
+# Счёт берётся из ACCTID выписки, если не задан default_account.
+# encoding=None — кодировка определяется по заголовку файла (ofx_encoding).
+def read_ofx(path, default_account=None, encoding=None):
+    if encoding is None:
+        with open(path, "rb") as f:
+            encoding = ofx_encoding(f.read(OFX_HEADER_SIZE))
+    with open(path, encoding=encoding, errors="replace") as f:
+        account = default_account
+        tx = None
+        number = 0
+        for closing, tag, value in _ofx_tags(f):
+            if tag == "ACCTID" and not closing and default_account is None:
+                account = value
+            elif tag == "STMTTRN":
+                if not closing:
+                    tx = {}
+                    number += 1
+                elif tx is not None:
+                    for required in OFX_REQUIRED_TAGS:
+                        if required not in tx:
+                            where = f"FITID {tx['FITID']}" if "FITID" in tx else f"№{number}"
+                            raise ValueError(f"В операции OFX ({where}) нет тега {required}")
+                    yield (
+                        parse_date(tx["DTPOSTED"][:8]),
+                        account,
+                        tx.get("TRNTYPE", ""),
+                        parse_amount(tx["TRNAMT"]),
+                        tx.get("MEMO") or tx.get("NAME", ""),
+                    )
+                    tx = None
+            elif tx is not None and not closing and value:
+                tx[tag] = value
+
+
+# Выбирает читатель по расширению файла
+def read_statement(path, default_account=None):
+    if Path(path).suffix.lower() in (".ofx", ".qfx"):
+        return read_ofx(path, default_account)
+    return read_csv(path, default_account=default_account)
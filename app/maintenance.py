@@ -0,0 +1,83 @@
+import os
+from concurrent.futures import ProcessPoolExecutor
+from functools import partial
+
+import numpy as np
+
+from app import arrays
+from app.database import Database
+
+# Сколько чеков обрабатывает одно задание пула при построении миниатюр
+THUMBNAIL_BATCH = 32
+
+# Соединение процесса пула: у каждого процесса своё, только для чтения
+_worker_db = None
+
+
+def _init_worker(path):
+    global _worker_db
+    _worker_db = Database(path, read_only=True)
+
+
+def _run(fn, item):
+    return fn(_worker_db, item)
+
+
+# Выполняет fn(db, item) для каждого item в пуле из workers процессов и возвращает результаты
+# в порядке items. Каждый процесс открывает базу path своим соединением только для чтения,
+# поэтому тяжёлые расчёты по счетам идут параллельно и не мешают записи.
+# fn должна быть функцией уровня модуля (передаётся в процессы через pickle).
+# workers <= 1 — расчёт в текущем процессе через db.
+def run_in_pool(db, fn, items, workers=None):
+    items = list(items)
+    if workers is None:
+        workers = os.cpu_count() or 1
+    workers = min(workers, len(items))
+    if workers <= 1:
+        return [fn(db, item) for item in items]
+    with ProcessPoolExecutor(max_workers=workers, initializer=_init_worker, initargs=(str(db.path),)) as pool:
+        return list(pool.map(partial(_run, fn), items))
+
+
+# Пересчитывает из транзакций счёта (в NumPy) дневные итоги и накопленный итог и сверяет
+# их с daily_balances. Возвращает словарь для отчёта; first_mismatch — первый день,
+# где итоги разошлись (None — расхождений нет).
+def check_daily_balances(db, account_id):
+    columns = arrays.load_transactions(db, account_id=account_id)
+    days, totals, running = arrays.daily_totals(columns)
+    stored = db.daily_balance_series(account_id)
+    stored_days = np.array([r["date"] for r in stored], dtype="datetime64[D]")
+    stored_totals = np.array([r["delta_cents"] for r in stored], dtype=np.int64)
+    stored_running = np.array([r["running_cents"] for r in stored], dtype=np.int64)
+
+    n = min(len(days), len(stored))
+    bad = (stored_days[:n] != days[:n]) | (stored_totals[:n] != totals[:n]) | (stored_running[:n] != running[:n])
+    first_mismatch = None
+    if bad.any():
+        i = np.flatnonzero(bad)[0]
+        first_mismatch = str(min(days[i], stored_days[i]))
+    elif len(days) != len(stored):
+        first_mismatch = str(days[n] if len(days) > n else stored_days[n])
+    return {
+        "account_id": account_id,
+        "transactions": len(columns),
+        "days": len(days),
+        "ledger_cents": int(running[-1]) if len(running) else 0,
+        "first_mismatch": first_mismatch,
+    }
+
+
+# Строит миниатюры для чеков hashes: пары (hash, data) для Database.store_thumbnails
+def build_thumbnails(db, hashes):
+    from app.receipts import make_thumbnail
+
+    result = []
+    for receipt_hash in hashes:
+        data = db.get_receipt(receipt_hash)
+        result.append((receipt_hash, make_thumbnail(data) if data else None))
+    return result
+
+
+# Пакеты хэшей для build_thumbnails
+def thumbnail_batches(hashes, size=THUMBNAIL_BATCH):
+    return [hashes[i:i + size] for i in range(0, len(hashes), size)]
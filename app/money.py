@@ -0,0 +1,35 @@
+import sqlite3
+from decimal import ROUND_HALF_UP, Decimal, InvalidOperation
+
+# Денежные суммы хранятся в базе целым числом копеек (INTEGER), поэтому сложение
+# балансов и сравнение сумм точные. Снаружи Database суммы — Decimal с двумя знаками.
+
+
+# Переводит сумму в копейки: Decimal, строку ("1234.56"), int (целые рубли) или float.
+# Доли копейки округляются по правилам бухгалтерии (половина — от нуля).
+def to_cents(value):
+    if isinstance(value, float):
+        # Через repr: 0.1 -> "0.1", а не двоичное приближение 0.1000000000000000055...
+        value = repr(value)
+    try:
+        return int((Decimal(value) * 100).to_integral_value(ROUND_HALF_UP))
+    except InvalidOperation:
+        raise ValueError(f"Некорректная сумма: {value!r}") from None
+
+
+def from_cents(cents):
+    return Decimal(cents).scaleb(-2)
+
+
+# Сумма в копейках для показа: "-1 234.56" (разряды разделяются пробелом)
+def format_cents(cents):
+    return f"{from_cents(int(cents)):,.2f}".replace(",", " ")
+
+
+# Колонка запроса с псевдонимом вида "amount [money]" приходит из базы уже как Decimal
+# (соединения открываются с detect_types=PARSE_COLNAMES)
+def _convert_money(value):
+    return Decimal(int(value)).scaleb(-2)
+
+
+sqlite3.register_converter("money", _convert_money)
@@ -0,0 +1,240 @@
+import json
+import logging
+import os
+import sqlite3
+import sys
+import threading
+import time
+from collections import deque
+
+# Профилирование SQL включается переменной окружения или ключом командной строки;
+# порог медленного запроса (мс) задаётся отдельной переменной
+ENV_FLAG = "FINANCE_SQL_PROFILE"
+CLI_FLAG = "--sql-profile"
+SLOW_ENV = "FINANCE_SLOW_QUERY_MS"
+SLOW_QUERY_MS = 50
+# Сколько последних медленных запросов хранится вместе с планами
+SLOW_LOG_SIZE = 100
+
+log = logging.getLogger("finance.sql")
+
+
+def profiling_enabled(argv=None):
+    argv = sys.argv if argv is None else argv
+    return os.environ.get(ENV_FLAG) == "1" or CLI_FLAG in argv
+
+
+def slow_query_ms():
+    value = os.environ.get(SLOW_ENV)
+    return float(value) if value else SLOW_QUERY_MS
+
+
+# Накопленная статистика одного SQL-запроса
+class QueryStats:
+    def __init__(self, sql):
+        self.sql = sql
+        self.count = 0
+        self.total = 0.0
+        self.max = 0.0
+        self.rows = 0
+
+    def as_dict(self):
+        return {
+            "sql": self.sql,
+            "count": self.count,
+            "total_ms": round(self.total * 1000, 3),
+            "avg_ms": round(self.total * 1000 / self.count, 3) if self.count else 0.0,
+            "max_ms": round(self.max * 1000, 3),
+            "rows": self.rows,
+        }
+
+
+# Собирает по каждому запросу число выполнений, суммарное и максимальное время
+# (выполнение вместе с чтением строк) и число возвращённых строк.
+# Запросы, превысившие slow_ms, записываются в журнал вместе с EXPLAIN QUERY PLAN.
+# Один профилировщик общий для соединений всех потоков, поэтому доступ под блокировкой.
+class QueryProfiler:
+    def __init__(self, slow_ms=SLOW_QUERY_MS):
+        self.slow_ms = slow_ms
+        self.slow = deque(maxlen=SLOW_LOG_SIZE)
+        self._stats = {}
+        self._keys = {}
+        self._lock = threading.Lock()
+        self.started = time.time()
+
+    # Запросы с разными пробелами и переносами строк считаются одним
+    def _key(self, sql):
+        key = self._keys.get(sql)
+        if key is None:
+            key = self._keys[sql] = " ".join(sql.split())
+        return key
+
+    def record(self, sql, seconds, rows=0, executed=0, elapsed=0.0):
+        key = self._key(sql)
+        with self._lock:
+            stats = self._stats.get(key)
+            if stats is None:
+                stats = self._stats[key] = QueryStats(key)
+            stats.count += executed
+            stats.total += seconds
+            stats.rows += rows
+            stats.max = max(stats.max, elapsed)
+
+    def is_slow(self, elapsed):
+        return self.slow_ms is not None and self.slow_ms > 0 and elapsed * 1000 >= self.slow_ms
+
+    # Записывает медленный запрос с его планом. План строится на том же соединении
+    # в обход профилирования, чтобы EXPLAIN не попадал в статистику.
+    def record_slow(self, conn, sql, params, elapsed):
+        key = self._key(sql)
+        plan = explain(conn, sql, params)
+        entry = {
+            "time": time.strftime("%Y-%m-%d %H:%M:%S"),
+            "sql": key,
+            "ms": round(elapsed * 1000, 3),
+            "plan": plan,
+        }
+        with self._lock:
+            self.slow.append(entry)
+        log.warning("Медленный запрос (%.1f мс): %s\n%s", elapsed * 1000, key, "\n".join(plan or []))
+
+    def reset(self):
+        with self._lock:
+            self._stats.clear()
+            self.slow.clear()
+            self.started = time.time()
+
+    # Отчёт: запросы по убыванию суммарного времени и журнал медленных запросов
+    def report(self):
+        with self._lock:
+            statements = [s.as_dict() for s in self._stats.values()]
+            slow = list(self.slow)
+        statements.sort(key=lambda s: s["total_ms"], reverse=True)
+        return {
+            "started": time.strftime("%Y-%m-%d %H:%M:%S", time.localtime(self.started)),
+            "slow_ms": self.slow_ms,
+            "statements": statements,
+            "slow": slow,
+        }
+
+    def dump(self, path):
+        with open(path, "w", encoding="utf-8") as f:
+            json.dump(self.report(), f, ensure_ascii=False, indent=2)
+
+
+# План выполнения запроса в виде строк с отступами по вложенности.
+# Возвращает None, если план построить нельзя (например, параметры executemany уже прочитаны).
+def explain(conn, sql, params=()):
+    try:
+        rows = sqlite3.Connection.execute(conn, "EXPLAIN QUERY PLAN " + sql, params).fetchall()
+    except sqlite3.Error:
+        return None
+    depth = {0: -1}
+    lines = []
+    for node_id, parent, _, detail in rows:
+        depth[node_id] = depth.get(parent, -1) + 1
+        lines.append("  " * depth[node_id] + detail)
+    return lines
+
+
+# Курсор, замеряющий время выполнения и чтения строк своего последнего запроса
+class ProfilingCursor(sqlite3.Cursor):
+    _sql = None
+    _params = ()
+    _elapsed = 0.0
+    _slow_logged = False
+
+    def _add(self, seconds, rows, executed=0):
+        profiler = ProfilingConnection.profiler
+        if profiler is None or self._sql is None:
+            return
+        self._elapsed += seconds
+        profiler.record(self._sql, seconds, rows, executed, self._elapsed)
+        if not self._slow_logged and profiler.is_slow(self._elapsed):
+            self._slow_logged = True
+            profiler.record_slow(self.connection, self._sql, self._params, self._elapsed)
+
+    def _start(self, sql, params):
+        self._sql = sql
+        self._params = params
+        self._elapsed = 0.0
+        self._slow_logged = False
+
+    def execute(self, sql, params=()):
+        start = time.perf_counter()
+        try:
+            return super().execute(sql, params)
+        finally:
+            self._start(sql, params)
+            self._add(time.perf_counter() - start, 0, 1)
+
+    def executemany(self, sql, seq_of_params):
+        start = time.perf_counter()
+        try:
+            return super().executemany(sql, seq_of_params)
+        finally:
+            self._start(sql, None)
+            self._add(time.perf_counter() - start, 0, 1)
+
+    def executescript(self, script):
+        start = time.perf_counter()
+        try:
+            return super().executescript(script)
+        finally:
+            self._start(script, None)
+            self._add(time.perf_counter() - start, 0, 1)
+
+    def fetchone(self):
+        start = time.perf_counter()
+        row = super().fetchone()
+        self._add(time.perf_counter() - start, row is not None)
+        return row
+
+    def fetchmany(self, size=None):
+        start = time.perf_counter()
+        rows = super().fetchmany(self.arraysize if size is None else size)
+        self._add(time.perf_counter() - start, len(rows))
+        return rows
+
+    def fetchall(self):
+        start = time.perf_counter()
+        rows = super().fetchall()
+        self._add(time.perf_counter() - start, len(rows))
+        return rows
+
+    def __next__(self):
+        start = time.perf_counter()
+        try:
+            row = super().__next__()
+        except StopIteration:
+            self._add(time.perf_counter() - start, 0)
+            raise
+        self._add(time.perf_counter() - start, 1)
+        return row
+
+
+# Соединение, которое при включённом профилировании выдаёт ProfilingCursor.
+# Без профилировщика курсоры обычные, и чтение строк не замедляется.
+class ProfilingConnection(sqlite3.Connection):
+    # Общий для всех соединений профилировщик (None — профилирование выключено)
+    profiler = None
+
+    def cursor(self, factory=None):
+        if factory is None:
+            factory = ProfilingCursor if self.profiler is not None else sqlite3.Cursor
+        return super().cursor(factory)
+
+    def execute(self, sql, params=()):
+        if self.profiler is None:
+            return super().execute(sql, params)
+        return self.cursor().execute(sql, params)
+
+    def executemany(self, sql, seq_of_params):
+        if self.profiler is None:
+            return super().executemany(sql, seq_of_params)
+        return self.cursor().executemany(sql, seq_of_params)
+
+    def executescript(self, script):
+        if self.profiler is None:
+            return super().executescript(script)
+        return self.cursor().executescript(script)
@@ -0,0 +1,112 @@
+from PyQt5 import QtCore, QtWidgets
+
+from app.database import Database
+
+STATS_COLUMNS = [
+    ("sql", "Запрос"),
+    ("count", "Вызовов"),
+    ("total_ms", "Всего, мс"),
+    ("avg_ms", "Среднее, мс"),
+    ("max_ms", "Макс., мс"),
+    ("rows", "Строк"),
+]
+
+
+# Окно отладки: статистика SQL-запросов и журнал медленных запросов с планами.
+# Профилирование можно включать и выключать на ходу; статистика обновляется раз в секунду.
+class QueryStatsDialog(QtWidgets.QDialog):
+    def __init__(self, profiler, parent=None):
+        super().__init__(parent)
+        self.profiler = profiler
+        self.setWindowTitle("Статистика SQL")
+        self.resize(1000, 650)
+
+        self.chkEnabled = QtWidgets.QCheckBox("Профилирование включено")
+        self.chkEnabled.setChecked(Database.get_profiler() is profiler)
+        self.chkEnabled.toggled.connect(self.set_enabled)
+        self.spinSlow = QtWidgets.QSpinBox()
+        self.spinSlow.setRange(0, 60000)
+        self.spinSlow.setSuffix(" мс")
+        self.spinSlow.setSpecialValueText("выкл.")
+        self.spinSlow.setValue(int(profiler.slow_ms or 0))
+        self.spinSlow.valueChanged.connect(self.set_slow_ms)
+
+        top = QtWidgets.QHBoxLayout()
+        top.addWidget(self.chkEnabled)
+        top.addStretch()
+        top.addWidget(QtWidgets.QLabel("Порог медленного запроса:"))
+        top.addWidget(self.spinSlow)
+
+        self.tblStats = QtWidgets.QTableWidget(0, len(STATS_COLUMNS))
+        self.tblStats.setHorizontalHeaderLabels([title for _, title in STATS_COLUMNS])
+        self.tblStats.horizontalHeader().setSectionResizeMode(0, QtWidgets.QHeaderView.Stretch)
+        self.tblStats.setEditTriggers(QtWidgets.QAbstractItemView.NoEditTriggers)
+        self.tblStats.setSelectionBehavior(QtWidgets.QAbstractItemView.SelectRows)
+        self.tblStats.setWordWrap(False)
+
+        self.txtSlow = QtWidgets.QPlainTextEdit()
+        self.txtSlow.setReadOnly(True)
+        self.txtSlow.setLineWrapMode(QtWidgets.QPlainTextEdit.NoWrap)
+
+        splitter = QtWidgets.QSplitter(QtCore.Qt.Vertical)
+        splitter.addWidget(self.tblStats)
+        splitter.addWidget(self.txtSlow)
+        splitter.setSizes([400, 250])
+
+        buttons = QtWidgets.QDialogButtonBox(QtWidgets.QDialogButtonBox.Close)
+        btnReset = buttons.addButton("Сбросить", QtWidgets.QDialogButtonBox.ResetRole)
+        btnSave = buttons.addButton("Сохранить JSON...", QtWidgets.QDialogButtonBox.ActionRole)
+        btnReset.clicked.connect(self.reset)
+        btnSave.clicked.connect(self.save_report)
+        buttons.rejected.connect(self.reject)
+
+        layout = QtWidgets.QVBoxLayout(self)
+        layout.addLayout(top)
+        layout.addWidget(splitter)
+        layout.addWidget(buttons)
+
+        self.timer = QtCore.QTimer(self)
+        self.timer.setInterval(1000)
+        self.timer.timeout.connect(self.refresh)
+        self.timer.start()
+        self.refresh()
+
+    def set_enabled(self, enabled):
+        Database.set_profiler(self.profiler if enabled else None)
+
+    def set_slow_ms(self, value):
+        self.profiler.slow_ms = value or None
+
+    def refresh(self):
+        report = self.profiler.report()
+        self.tblStats.setRowCount(len(report["statements"]))
+        for row, stats in enumerate(report["statements"]):
+            for col, (key, _) in enumerate(STATS_COLUMNS):
+                item = QtWidgets.QTableWidgetItem(str(stats[key]))
+                if key == "sql":
+                    item.setToolTip(stats[key])
+                else:
+                    item.setTextAlignment(QtCore.Qt.AlignRight | QtCore.Qt.AlignVCenter)
+                self.tblStats.setItem(row, col, item)
+
+        lines = []
+        for entry in reversed(report["slow"]):
+            lines.append(f"[{entry['time']}] {entry['ms']} мс: {entry['sql']}")
+            lines.extend("    " + line for line in entry["plan"] or ["(план недоступен)"])
+            lines.append("")
+        text = "\n".join(lines)
+        if text != self.txtSlow.toPlainText():
+            self.txtSlow.setPlainText(text)
+
+    def reset(self):
+        self.profiler.reset()
+        self.refresh()
+
+    def save_report(self):
+        path, _ = QtWidgets.QFileDialog.getSaveFileName(self, "Сохранить отчёт", "sql_profile.json", "JSON (*.json)")
+        if not path:
+            return
+        try:
+            self.profiler.dump(path)
+        except OSError as e:
+            QtWidgets.QMessageBox.critical(self, "Ошибка", f"Не удалось сохранить отчёт:\n{e}")
@@ -0,0 +1,126 @@
+import os
+import threading
+from pathlib import Path
+
+# Сторона миниатюры чека в пикселях (с запасом для экранов с высокой плотностью)
+THUMBNAIL_SIZE = 64
+# Предел размера дискового кэша фото чеков
+CACHE_MAX_BYTES = 200 * 1024 * 1024
+
+# Сигнатуры форматов изображений для выбора расширения файла чека
+IMAGE_SIGNATURES = [
+    (b"\x89PNG\r\n\x1a\n", ".png"),
+    (b"\xff\xd8\xff", ".jpg"),
+    (b"BM", ".bmp"),
+    (b"GIF8", ".gif"),
+]
+
+
+# Определяет расширение файла изображения по его первым байтам
+def receipt_extension(data):
+    for signature, ext in IMAGE_SIGNATURES:
+        if data.startswith(signature):
+            return ext
+    if data[:4] == b"RIFF" and data[8:12] == b"WEBP":
+        return ".webp"
+    return ".bin"
+
+
+# Миниатюра изображения (JPEG, или PNG для картинок с прозрачностью) не больше size x size.
+# Изображение уменьшается уже при декодировании (QImageReader.setScaledSize), поэтому
+# большие фото не разворачиваются в память целиком. Возвращает None, если это не изображение.
+# Qt импортируется здесь, чтобы модулем можно было пользоваться и без интерфейса;
+# QImage работает в любом потоке.
+def make_thumbnail(data, size=THUMBNAIL_SIZE):
+    from PyQt5 import QtCore, QtGui
+
+    buffer = QtCore.QBuffer()
+    buffer.setData(data)
+    buffer.open(QtCore.QIODevice.ReadOnly)
+    reader = QtGui.QImageReader(buffer)
+    reader.setAutoTransform(True)
+    original = reader.size()
+    if original.isValid():
+        reader.setScaledSize(original.scaled(size, size, QtCore.Qt.KeepAspectRatio))
+    image = reader.read()
+    if image.isNull():
+        return None
+    if image.width() > size or image.height() > size:
+        image = image.scaled(size, size, QtCore.Qt.KeepAspectRatio, QtCore.Qt.SmoothTransformation)
+
+    out = QtCore.QBuffer()
+    out.open(QtCore.QIODevice.WriteOnly)
+    if image.hasAlphaChannel():
+        image.save(out, "PNG")
+    else:
+        image.save(out, "JPG", 85)
+    return bytes(out.data())
+
+
+# Дисковый кэш фото чеков для просмотра во внешней программе.
+# Файл называется по хэшу содержимого с расширением по формату изображения, поэтому
+# одно фото сохраняется один раз. При превышении max_bytes удаляются файлы, которые
+# дольше всех не открывались (время доступа отмечается через mtime).
+class ReceiptCache:
+    def __init__(self, directory, max_bytes=CACHE_MAX_BYTES):
+        self.directory = Path(directory)
+        self.max_bytes = max_bytes
+        self._lock = threading.Lock()
+        self._files = {}
+        self.directory.mkdir(parents=True, exist_ok=True)
+        for entry in os.scandir(self.directory):
+            if entry.is_file() and not entry.name.endswith(".tmp"):
+                stat = entry.stat()
+                self._files[Path(entry.name).stem] = [entry.name, stat.st_size, stat.st_mtime]
+        self.size = sum(size for _, size, _ in self._files.values())
+
+    # Путь к файлу чека из кэша или None, если его там нет
+    def get(self, receipt_hash):
+        with self._lock:
+            item = self._files.get(receipt_hash)
+            if item is None:
+                return None
+            path = self.directory / item[0]
+            try:
+                os.utime(path)
+            except OSError:
+                # Файл удалили снаружи
+                self.size -= item[1]
+                del self._files[receipt_hash]
+                return None
+            item[2] = path.stat().st_mtime
+            return path
+
+    # Сохраняет фото в кэш и возвращает путь к файлу
+    def put(self, receipt_hash, data):
+        name = receipt_hash + receipt_extension(data)
+        path = self.directory / name
+        tmp = path.with_suffix(path.suffix + ".tmp")
+        tmp.write_bytes(data)
+        os.replace(tmp, path)
+        with self._lock:
+            old = self._files.get(receipt_hash)
+            if old is not None:
+                self.size -= old[1]
+            self._files[receipt_hash] = [name, len(data), path.stat().st_mtime]
+            self.size += len(data)
+            self._evict(keep=receipt_hash)
+        return path
+
+    def _evict(self, keep):
+        if self.size <= self.max_bytes:
+            return
+        for receipt_hash, (name, size, _) in sorted(self._files.items(), key=lambda kv: kv[1][2]):
+            if self.size <= self.max_bytes:
+                break
+            if receipt_hash == keep:
+                continue
+            try:
+                os.remove(self.directory / name)
+            except FileNotFoundError:
+                pass
+            except OSError:
+                # Файл открыт другой программой (Windows) — удалим в следующий раз
+                continue
+            self.size -= size
+            del self._files[receipt_hash]
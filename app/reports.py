@@ -0,0 +1,173 @@
+import threading
+from collections import OrderedDict
+
+import numpy as np
+
+# Сколько результатов отчётов хранится в кэше
+REPORT_CACHE_SIZE = 64
+# Сколько категорий показывает отчёт «Топ категорий»
+TOP_CATEGORIES = 10
+
+
+# Сводная таблица отчёта: строки (например, месяцы) x колонки (категории, счета).
+# income, expense (≤ 0) и count — матрицы int64 формы (строки, колонки), суммы в копейках.
+class Pivot:
+    def __init__(self, rows, columns, income, expense, count):
+        self.rows = rows
+        self.columns = columns
+        self.income = income
+        self.expense = expense
+        self.count = count
+
+    @property
+    def net(self):
+        return self.income + self.expense
+
+    # Итоги по колонкам за все строки: (income, expense, count)
+    def column_totals(self):
+        return self.income.sum(axis=0), self.expense.sum(axis=0), self.count.sum(axis=0)
+
+
+# Одномерный итог: подписи и суммы по ним (копейки)
+class Ranking:
+    def __init__(self, labels, income, expense, count):
+        self.labels = labels
+        self.income = income
+        self.expense = expense
+        self.count = count
+
+
+# Раскладывает строки (row_key, column_key, income, expense, count) в матрицы Pivot.
+# Ключи переводятся в номера строк и колонок векторно через np.unique.
+def _pivot(rows, column_labels=None):
+    if not rows:
+        empty = np.zeros((0, 0), dtype=np.int64)
+        return Pivot([], [], empty, empty, empty)
+    row_keys, column_keys, income, expense, count = zip(*rows)
+    row_labels, row_index = np.unique(np.array(row_keys, dtype=object), return_inverse=True)
+    column_ids, column_index = np.unique(np.array(column_keys, dtype=object), return_inverse=True)
+    shape = (len(row_labels), len(column_ids))
+    matrices = []
+    for values in (income, expense, count):
+        matrix = np.zeros(shape, dtype=np.int64)
+        matrix[row_index, column_index] = np.array(values, dtype=np.int64)
+        matrices.append(matrix)
+    columns = column_ids.tolist()
+    if column_labels is not None:
+        columns = [column_labels.get(c, str(c)) for c in columns]
+    return Pivot(row_labels.tolist(), columns, *matrices)
+
+
+# Доходы и расходы по категориям помесячно (строки — месяцы 'YYYY-MM', колонки — категории)
+def monthly_categories(db, date_from=None, date_to=None, account_id=None):
+    return _pivot(db.transaction_totals(("month", "category"), date_from, date_to, account_id))
+
+
+# Категории с наибольшими расходами за период, по убыванию расходов
+def top_categories(db, date_from=None, date_to=None, account_id=None, limit=TOP_CATEGORIES):
+    rows = db.transaction_totals(("category",), date_from, date_to, account_id)
+    if not rows:
+        empty = np.zeros(0, dtype=np.int64)
+        return Ranking([], empty, empty, empty)
+    labels, income, expense, count = zip(*rows)
+    income = np.array(income, dtype=np.int64)
+    expense = np.array(expense, dtype=np.int64)
+    count = np.array(count, dtype=np.int64)
+    order = np.argsort(expense, kind="stable")[:limit]
+    return Ranking([labels[i] for i in order], income[order], expense[order], count[order])
+
+
+# Сравнение счетов помесячно (строки — месяцы, колонки — названия счетов)
+def account_summary(db, date_from=None, date_to=None, account_id=None):
+    names = {a["id"]: a["name"] for a in db.list_accounts()}
+    return _pivot(db.transaction_totals(("month", "account"), date_from, date_to, account_id), names)
+
+
+REPORTS = {
+    "monthly_categories": monthly_categories,
+    "top_categories": top_categories,
+    "account_summary": account_summary,
+}
+
+
+# Затрагивает ли изменение (account_id, 'YYYY-MM') отчёт с такими фильтрами
+def _affects(filters, account_id, month):
+    date_from, date_to, filter_account = filters
+    if filter_account is not None and filter_account != account_id:
+        return False
+    if date_from is not None and month < date_from[:7]:
+        return False
+    if date_to is not None and month > date_to[:7]:
+        return False
+    return True
+
+
+# LRU-кэш результатов отчётов по ключу (отчёт, date_from, date_to, account_id).
+# Подписывается на Database.add_write_listener: запись транзакций сбрасывает только
+# отчёты, чьи фильтры захватывают изменённые счёт и месяц. Изменения самого счёта
+# (месяц None — баланс, создание) на суммы транзакций не влияют и кэш не трогают.
+# Отчёт, во время расчёта которого пришла затрагивающая его запись, в кэш не кладётся.
+class ReportCache:
+    def __init__(self, size=REPORT_CACHE_SIZE):
+        self.size = size
+        self._items = OrderedDict()
+        self._running = []
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        with self._lock:
+            value = self._items.get(key)
+            if value is not None:
+                self._items.move_to_end(key)
+            return value
+
+    # Отмечает начало расчёта отчёта key; возвращает метку для put()
+    def start(self, key):
+        token = {"key": key, "stale": False}
+        with self._lock:
+            self._running.append(token)
+        return token
+
+    # Расчёт не удался — метка больше не нужна
+    def cancel(self, token):
+        with self._lock:
+            self._running.remove(token)
+
+    def put(self, token, value):
+        with self._lock:
+            self._running.remove(token)
+            if token["stale"]:
+                return
+            self._items[token["key"]] = value
+            self._items.move_to_end(token["key"])
+            while len(self._items) > self.size:
+                self._items.popitem(last=False)
+
+    def invalidate(self, changes):
+        changes = [(account_id, month) for account_id, month in changes if month is not None]
+        if not changes:
+            return
+        with self._lock:
+            for key in list(self._items):
+                if any(_affects(key[1:], account_id, month) for account_id, month in changes):
+                    del self._items[key]
+            for token in self._running:
+                if any(_affects(token["key"][1:], account_id, month) for account_id, month in changes):
+                    token["stale"] = True
+
+
+# Возвращает отчёт name из кэша или считает его и кэширует.
+# Можно вызывать в фоновом потоке: worker.submit(cached_report, cache, name, ...).
+def cached_report(db, cache, name, date_from=None, date_to=None, account_id=None):
+    key = (name, date_from, date_to, account_id)
+    result = cache.get(key)
+    if result is not None:
+        return result
+    token = cache.start(key)
+    try:
+        result = REPORTS[name](db, date_from, date_to, account_id)
+    except BaseException:
+        cache.cancel(token)
+        raise
+    cache.put(token, result)
+    return result
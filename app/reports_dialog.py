@@ -0,0 +1,144 @@
+from PyQt5 import QtCore, QtWidgets
+
+from app.money import format_cents
+from app.reports import Ranking, cached_report
+
+# Отчёты в порядке списка: (имя в app.reports.REPORTS, название)
+REPORT_TITLES = [
+    ("monthly_categories", "Доходы и расходы по категориям по месяцам"),
+    ("top_categories", "Топ категорий расходов"),
+    ("account_summary", "Сравнение счетов по месяцам"),
+]
+# Что показывается в ячейках сводной таблицы
+PIVOT_VALUES = [
+    ("expense", "Расходы"),
+    ("income", "Доходы"),
+    ("net", "Итог"),
+]
+
+
+# Окно отчётов. Отчёт считается в фоновом потоке и кэшируется (app.reports.ReportCache),
+# поэтому повторное открытие с теми же фильтрами не обращается к базе.
+class ReportsDialog(QtWidgets.QDialog):
+    def __init__(self, worker, cache, accounts, parent=None):
+        super().__init__(parent)
+        self.worker = worker
+        self.cache = cache
+        self.result = None
+        self.setWindowTitle("Отчёты")
+        self.resize(1000, 600)
+
+        self.cmbReport = QtWidgets.QComboBox()
+        for _, title in REPORT_TITLES:
+            self.cmbReport.addItem(title)
+        self.cmbValue = QtWidgets.QComboBox()
+        for _, title in PIVOT_VALUES:
+            self.cmbValue.addItem(title)
+        self.cmbAccount = QtWidgets.QComboBox()
+        self.cmbAccount.addItem("Все счета", None)
+        for a in accounts:
+            self.cmbAccount.addItem(a["name"], a["id"])
+
+        self.chkDateRange = QtWidgets.QCheckBox("Период:")
+        self.dateFrom = QtWidgets.QDateEdit(QtCore.QDate.currentDate().addYears(-1))
+        self.dateTo = QtWidgets.QDateEdit(QtCore.QDate.currentDate())
+        for edit in (self.dateFrom, self.dateTo):
+            edit.setCalendarPopup(True)
+            edit.setDisplayFormat("dd.MM.yyyy")
+            edit.setEnabled(False)
+            self.chkDateRange.toggled.connect(edit.setEnabled)
+
+        filters = QtWidgets.QHBoxLayout()
+        filters.addWidget(self.cmbReport)
+        filters.addWidget(self.cmbValue)
+        filters.addWidget(self.cmbAccount)
+        filters.addWidget(self.chkDateRange)
+        filters.addWidget(self.dateFrom)
+        filters.addWidget(QtWidgets.QLabel("—"))
+        filters.addWidget(self.dateTo)
+        filters.addStretch()
+
+        self.table = QtWidgets.QTableWidget()
+        self.table.setEditTriggers(QtWidgets.QAbstractItemView.NoEditTriggers)
+        self.lblStatus = QtWidgets.QLabel()
+
+        buttons = QtWidgets.QDialogButtonBox(QtWidgets.QDialogButtonBox.Close)
+        buttons.rejected.connect(self.reject)
+
+        layout = QtWidgets.QVBoxLayout(self)
+        layout.addLayout(filters)
+        layout.addWidget(self.table)
+        layout.addWidget(self.lblStatus)
+        layout.addWidget(buttons)
+
+        self.cmbReport.currentIndexChanged.connect(self.load)
+        self.cmbAccount.currentIndexChanged.connect(self.load)
+        self.chkDateRange.toggled.connect(self.load)
+        self.dateFrom.dateChanged.connect(self.load)
+        self.dateTo.dateChanged.connect(self.load)
+        self.cmbValue.currentIndexChanged.connect(self.show_result)
+        self.load()
+
+    def load(self):
+        name = REPORT_TITLES[self.cmbReport.currentIndex()][0]
+        self.cmbValue.setEnabled(name != "top_categories")
+        date_from = date_to = None
+        if self.chkDateRange.isChecked():
+            date_from = self.dateFrom.date().toString("yyyy-MM-dd")
+            date_to = self.dateTo.date().toString("yyyy-MM-dd")
+        self.lblStatus.setText("Расчёт...")
+        self.worker.submit(
+            cached_report, self.cache, name, date_from, date_to, self.cmbAccount.currentData(),
+            channel="report", on_done=self._loaded, on_error=self._failed
+        )
+
+    def _loaded(self, result):
+        self.result = result
+        self.lblStatus.setText("Суммы в рублях")
+        self.show_result()
+
+    def _failed(self, message):
+        self.lblStatus.setText(f"Не удалось построить отчёт: {message}")
+
+    def show_result(self):
+        if self.result is None:
+            return
+        if isinstance(self.result, Ranking):
+            self._show_ranking(self.result)
+        else:
+            self._show_pivot(self.result)
+        self.table.resizeColumnsToContents()
+
+    def _show_ranking(self, ranking):
+        self.table.clear()
+        self.table.setColumnCount(4)
+        self.table.setHorizontalHeaderLabels(["Категория", "Расходы", "Доходы", "Операций"])
+        self.table.setRowCount(len(ranking.labels))
+        self.table.verticalHeader().setVisible(False)
+        for i, label in enumerate(ranking.labels):
+            self.table.setItem(i, 0, QtWidgets.QTableWidgetItem(label or "(без категории)"))
+            self._set_number(i, 1, format_cents(ranking.expense[i]))
+            self._set_number(i, 2, format_cents(ranking.income[i]))
+            self._set_number(i, 3, str(ranking.count[i]))
+
+    # Сводная таблица: строки — месяцы и «Итого», колонки — категории или счета
+    def _show_pivot(self, pivot):
+        field = PIVOT_VALUES[self.cmbValue.currentIndex()][0]
+        values = getattr(pivot, field)
+        self.table.clear()
+        self.table.setColumnCount(len(pivot.columns))
+        self.table.setHorizontalHeaderLabels([c or "(без категории)" for c in pivot.columns])
+        self.table.setRowCount(len(pivot.rows) + 1)
+        self.table.verticalHeader().setVisible(True)
+        self.table.setVerticalHeaderLabels(list(pivot.rows) + ["Итого"])
+        for i in range(len(pivot.rows)):
+            for j in range(len(pivot.columns)):
+                self._set_number(i, j, format_cents(values[i, j]) if pivot.count[i, j] else "")
+        totals = values.sum(axis=0)
+        for j in range(len(pivot.columns)):
+            self._set_number(len(pivot.rows), j, format_cents(totals[j]))
+
+    def _set_number(self, row, column, text):
+        item = QtWidgets.QTableWidgetItem(text)
+        item.setTextAlignment(QtCore.Qt.AlignRight | QtCore.Qt.AlignVCenter)
+        self.table.setItem(row, column, item)
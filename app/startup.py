@@ -0,0 +1,51 @@
+import os
+import sys
+import time
+from pathlib import Path
+
+# Отчёт о времени запуска включается переменной окружения или ключом командной строки
+ENV_FLAG = "FINANCE_STARTUP_TIMING"
+CLI_FLAG = "--startup-timing"
+LOG_NAME = "startup_timing.log"
+
+
+def startup_timing_enabled(argv=None):
+    argv = sys.argv if argv is None else argv
+    return os.environ.get(ENV_FLAG) == "1" or CLI_FLAG in argv
+
+
+# Замеряет длительность фаз запуска (импорт, интерфейс, открытие базы, первая отрисовка).
+# Отключённый таймер ничего не делает, поэтому вызовы mark() можно оставлять в коде.
+class StartupTimer:
+    def __init__(self, start, enabled):
+        self.enabled = enabled
+        self.start = start
+        self.last = start
+        self.phases = []
+        self.reported = False
+
+    def mark(self, phase):
+        if not self.enabled:
+            return
+        now = time.perf_counter()
+        self.phases.append((phase, now - self.last))
+        self.last = now
+
+    def format(self):
+        lines = [f"{phase:<20}{seconds * 1000:9.1f} мс" for phase, seconds in self.phases]
+        lines.append(f"{'итого':<20}{(self.last - self.start) * 1000:9.1f} мс")
+        return "\n".join(lines)
+
+    # Выводит отчёт один раз: в stderr, а в собранном exe (где консоли нет) —
+    # дописывает в startup_timing.log рядом с исполняемым файлом
+    def report(self):
+        if not self.enabled or self.reported:
+            return
+        self.reported = True
+        text = "Время запуска:\n" + self.format() + "\n"
+        if getattr(sys, 'frozen', False) or sys.stderr is None:
+            log = Path(sys.executable).parent / LOG_NAME
+            with open(log, "a", encoding="utf-8") as f:
+                f.write(time.strftime("[%Y-%m-%d %H:%M:%S] ") + text)
+        else:
+            sys.stderr.write(text)
@@ -0,0 +1,95 @@
+from PyQt5 import QtCore
+
+from app.database import Database
+from app.receipts import make_thumbnail
+
+# Сколько чеков без миниатюр читается из базы за один проход
+THUMBNAIL_BATCH = 16
+
+
+# Строит миниатюры одного чека в потоке пула
+class _ThumbnailTask(QtCore.QRunnable):
+    def __init__(self, service, receipt_hash, data):
+        super().__init__()
+        self.service = service
+        self.receipt_hash = receipt_hash
+        self.data = data
+
+    def run(self):
+        try:
+            thumbnail = make_thumbnail(self.data)
+        except Exception:
+            thumbnail = None
+        self.service._built.emit(self.receipt_hash, thumbnail)
+
+
+# Построение миниатюр фото чеков. Чеки без миниатюр читаются пачками через DatabaseWorker,
+# изображения уменьшаются в пуле потоков (QImage можно использовать вне потока интерфейса),
+# а готовые миниатюры записываются одной транзакцией; затем берётся следующая пачка.
+# Вызывается после каждой записи, добавляющей чеки, и при запуске — для старых чеков.
+class ThumbnailService(QtCore.QObject):
+    # Словарь {hash: миниатюра} сохранённых миниатюр (None — не изображение)
+    thumbnailsReady = QtCore.pyqtSignal(dict)
+
+    _built = QtCore.pyqtSignal(str, object)
+
+    def __init__(self, worker, parent=None):
+        super().__init__(parent)
+        self.worker = worker
+        self.pool = QtCore.QThreadPool(self)
+        self.pool.setMaxThreadCount(max(1, QtCore.QThread.idealThreadCount() - 1))
+        self._built.connect(self._on_built)
+        self._running = False
+        self._again = False
+        self._outstanding = 0
+        self._results = {}
+
+    def update(self):
+        if self._running:
+            self._again = True
+            return
+        self._running = True
+        self._again = False
+        self.worker.submit(
+            Database.receipts_without_thumbnails, THUMBNAIL_BATCH, channel="thumbnails",
+            on_done=self._build, on_error=self._failed
+        )
+
+    def _build(self, rows):
+        if not rows:
+            self._finish()
+            return
+        self._outstanding = len(rows)
+        self._results = {}
+        for row in rows:
+            self.pool.start(_ThumbnailTask(self, row["hash"], row["data"]))
+
+    def _on_built(self, receipt_hash, thumbnail):
+        self._results[receipt_hash] = thumbnail
+        self._outstanding -= 1
+        if self._outstanding:
+            return
+        results = self._results
+        self._results = {}
+        self.worker.submit(
+            Database.store_thumbnails, list(results.items()),
+            on_done=lambda _: self._stored(results), on_error=self._failed
+        )
+
+    def _stored(self, results):
+        self.thumbnailsReady.emit(results)
+        self._running = False
+        self.update()
+
+    def _failed(self, message):
+        self._finish()
+
+    def _finish(self):
+        self._running = False
+        if self._again:
+            self.update()
+
+    # Останавливает построение; вызывается при закрытии окна до остановки DatabaseWorker
+    def stop(self):
+        self.pool.clear()
+        self.pool.waitForDone()
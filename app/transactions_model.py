@@ -0,0 +1,157 @@
+from PyQt5 import QtCore, QtGui
+
+from app.database import Database
+
+# Колонки таблицы транзакций: (заголовок, поле строки из базы)
+COLUMNS = [
+    ("Дата", "date"),
+    ("Счёт", "account"),
+    ("Категория", "category"),
+    ("Сумма", "amount"),
+    ("Комментарий", "comment"),
+    ("Фото", "has_photo"),
+]
+
+PAGE_SIZE = 200
+
+
+# Модель таблицы транзакций с постраничной подгрузкой из SQLite.
+# Строки запрашиваются у базы страницами по мере прокрутки (canFetchMore/fetchMore),
+# поэтому память и время перерисовки зависят от просмотренной части, а не от размера таблицы.
+# Страницы читаются в фоновом потоке (DatabaseWorker) и добавляются, когда готовы.
+# В колонке «Фото» показывается миниатюра чека, если она уже построена.
+class TransactionsModel(QtCore.QAbstractTableModel):
+    # Текст ошибки чтения страницы. Загруженные строки остаются, следующая прокрутка
+    # запрашивает страницу снова (отменённые запросы ошибкой не считаются)
+    pageFailed = QtCore.pyqtSignal(str)
+
+    def __init__(self, worker, parent=None, page_size=PAGE_SIZE):
+        super().__init__(parent)
+        self.worker = worker
+        self.page_size = page_size
+        self.search = None
+        self._rows = []
+        self._exhausted = False
+        self._loading = None
+        self._thumbnails = {}
+        self._pixmaps = {}
+
+    # Задаёт строку поиска и перезапрашивает строки (пустая строка — без фильтра)
+    def set_search(self, text):
+        text = text.strip() or None
+        if text == self.search:
+            return
+        self.search = text
+        self.reload()
+
+    # Сбрасывает загруженные строки и заново запрашивает первую страницу.
+    # Ещё не полученная страница прежнего запроса отменяется.
+    def reload(self):
+        if self._loading is not None:
+            self._loading.cancel()
+            self._loading = None
+        self.beginResetModel()
+        self._rows = []
+        self._thumbnails = {}
+        self._pixmaps = {}
+        self._exhausted = False
+        self.endResetModel()
+        self.fetchMore(QtCore.QModelIndex())
+
+    def rowCount(self, parent=QtCore.QModelIndex()):
+        if parent.isValid():
+            return 0
+        return len(self._rows)
+
+    def columnCount(self, parent=QtCore.QModelIndex()):
+        if parent.isValid():
+            return 0
+        return len(COLUMNS)
+
+    def headerData(self, section, orientation, role=QtCore.Qt.DisplayRole):
+        if role == QtCore.Qt.DisplayRole and orientation == QtCore.Qt.Horizontal:
+            return COLUMNS[section][0]
+        return None
+
+    def data(self, index, role=QtCore.Qt.DisplayRole):
+        if not index.isValid():
+            return None
+        row = self._rows[index.row()]
+        field = COLUMNS[index.column()][1]
+        if role == QtCore.Qt.DecorationRole and field == "has_photo":
+            return self._pixmap(row["receipt_hash"])
+        if role != QtCore.Qt.DisplayRole:
+            return None
+        value = row[field]
+        if field == "has_photo":
+            if self._pixmap(row["receipt_hash"]) is not None:
+                return None
+            return "📷" if value else "-"
+        if field == "amount":
+            return f"{value:.2f}"
+        return value
+
+    # Миниатюра чека (QPixmap создаётся при первой отрисовке) или None
+    def _pixmap(self, receipt_hash):
+        if receipt_hash is None:
+            return None
+        pixmap = self._pixmaps.get(receipt_hash)
+        if pixmap is None:
+            data = self._thumbnails.get(receipt_hash)
+            if not data:
+                return None
+            pixmap = QtGui.QPixmap()
+            pixmap.loadFromData(data)
+            self._pixmaps[receipt_hash] = pixmap
+        return pixmap
+
+    # Добавляет построенные миниатюры (ThumbnailService.thumbnailsReady) и перерисовывает их строки
+    def add_thumbnails(self, thumbnails):
+        self._thumbnails.update(thumbnails)
+        column = [f for _, f in COLUMNS].index("has_photo")
+        for i, row in enumerate(self._rows):
+            if row["receipt_hash"] in thumbnails:
+                index = self.index(i, column)
+                self.dataChanged.emit(index, index, [QtCore.Qt.DisplayRole, QtCore.Qt.DecorationRole])
+
+    def canFetchMore(self, parent=QtCore.QModelIndex()):
+        if parent.isValid():
+            return False
+        return not self._exhausted and self._loading is None
+
+    # Запрашивает следующую страницу по ключу (date, id) последней загруженной строки
+    def fetchMore(self, parent=QtCore.QModelIndex()):
+        if parent.isValid() or self._exhausted or self._loading is not None:
+            return
+        after = None
+        if self._rows:
+            last = self._rows[-1]
+            after = (last["date"], last["id"])
+        self._loading = self.worker.submit(
+            Database.list_transactions_page, after, self.page_size, self.search,
+            channel="transactions", on_done=self._append_page, on_error=self._page_failed
+        )
+
+    def _page_failed(self, message):
+        self._loading = None
+        self.pageFailed.emit(message)
+
+    def _append_page(self, page):
+        self._loading = None
+        if len(page) < self.page_size:
+            self._exhausted = True
+        if not page:
+            return
+        for row in page:
+            if row["thumbnail"] is not None:
+                self._thumbnails[row["receipt_hash"]] = row["thumbnail"]
+        first = len(self._rows)
+        self.beginInsertRows(QtCore.QModelIndex(), first, first + len(page) - 1)
+        self._rows.extend(page)
+        self.endInsertRows()
+
+    # Возвращает строку базы (sqlite3.Row) для строки таблицы
+    def row_data(self, row):
+        if 0 <= row < len(self._rows):
+            return self._rows[row]
+        return None
@@ -0,0 +1,176 @@
+import itertools
+import threading
+
+from PyQt5 import QtCore
+
+from app.database import Database
+
+
+# Задание для фонового потока: функция fn(db, *args) и обработчики результата.
+# Обработчики вызываются в потоке интерфейса; результат отменённого задания отбрасывается.
+class Job:
+    _ids = itertools.count(1)
+
+    def __init__(self, worker, fn, args, kwargs, channel, on_done, on_error, on_progress):
+        self.id = next(self._ids)
+        self.worker = worker
+        self.fn = fn
+        self.args = args
+        self.kwargs = kwargs
+        self.channel = channel
+        self.on_done = on_done
+        self.on_error = on_error
+        self.on_progress = on_progress
+        self.cancelled = False
+        self.stopping = False
+
+    # Отменяет задание: ещё не начатое не будет выполнено, выполняющийся запрос SQLite прерывается,
+    # а результат отбрасывается
+    def cancel(self):
+        self.worker.cancel(self)
+
+    # Просит длинную операцию остановиться на ближайшей проверке report();
+    # в отличие от cancel() уже сделанная часть и результат сохраняются
+    def stop(self):
+        self.stopping = True
+
+    # Сообщает о ходе выполнения (вызывается из фонового потока).
+    # Возвращает False, если задание отменено или остановлено — операция должна завершиться.
+    def report(self, value):
+        self.worker._progress.emit(self, value)
+        return not (self.cancelled or self.stopping)
+
+
+# Выполняет запросы к базе в отдельном потоке со своим соединением SQLite,
+# чтобы цикл событий Qt не блокировался на вводе-выводе.
+# Задания выполняются по очереди в порядке отправки.
+class _Executor(QtCore.QObject):
+    done = QtCore.pyqtSignal(object, object)
+    failed = QtCore.pyqtSignal(object, str)
+
+    def __init__(self, path):
+        super().__init__()
+        self.path = path
+        self.db = None
+        self.current = None
+        self.lock = threading.Lock()
+
+    @QtCore.pyqtSlot()
+    def open(self):
+        self.db = Database(self.path)
+
+    @QtCore.pyqtSlot()
+    def close(self):
+        if self.db is not None:
+            self.db.close()
+            self.db = None
+
+    @QtCore.pyqtSlot(object)
+    def run(self, job):
+        with self.lock:
+            if job.cancelled:
+                self.done.emit(job, None)
+                return
+            self.current = job
+        try:
+            kwargs = dict(job.kwargs)
+            if job.on_progress is not None:
+                kwargs["progress"] = job.report
+            result = job.fn(self.db, *job.args, **kwargs)
+        except Exception as e:
+            self.failed.emit(job, str(e))
+        else:
+            self.done.emit(job, result)
+        finally:
+            with self.lock:
+                self.current = None
+
+    # Прерывает выполняющийся запрос, если это указанное задание (вызывается из потока интерфейса).
+    # Выборки идут через пул читателей, поэтому прерываются и соединения, взятые заданием из пула.
+    def interrupt(self, job):
+        with self.lock:
+            if self.current is job and self.db is not None:
+                self.db.interrupt()
+
+
+class DatabaseWorker(QtCore.QObject):
+    # Испускается, когда появляются или заканчиваются задания в работе (для индикатора занятости)
+    busyChanged = QtCore.pyqtSignal(bool)
+
+    _submit = QtCore.pyqtSignal(object)
+    _progress = QtCore.pyqtSignal(object, object)
+
+    # path — файл базы (тот же, что у основного соединения)
+    def __init__(self, path=None, parent=None):
+        super().__init__(parent)
+        self._pending = set()
+        self._channels = {}
+
+        self._thread = QtCore.QThread()
+        self._executor = _Executor(path)
+        self._executor.moveToThread(self._thread)
+        self._thread.started.connect(self._executor.open)
+        # finished испускается из самого фонового потока — соединение закрывается там же, где открыто
+        self._thread.finished.connect(self._executor.close, QtCore.Qt.DirectConnection)
+        self._submit.connect(self._executor.run)
+        self._executor.done.connect(self._on_done)
+        self._executor.failed.connect(self._on_failed)
+        self._progress.connect(self._on_progress)
+        self._thread.start()
+
+    # Ставит в очередь fn(db, *args, **kwargs), где db — соединение фонового потока.
+    # channel — имя потока однотипных запросов: новое задание отменяет предыдущее в том же канале
+    # (например, устаревший поиск). Если задан on_progress, в fn передаётся progress=job.report.
+    def submit(self, fn, *args, channel=None, on_done=None, on_error=None, on_progress=None, **kwargs):
+        job = Job(self, fn, args, kwargs, channel, on_done, on_error, on_progress)
+        if channel is not None:
+            previous = self._channels.get(channel)
+            if previous is not None:
+                self.cancel(previous)
+            self._channels[channel] = job
+        self._pending.add(job)
+        if len(self._pending) == 1:
+            self.busyChanged.emit(True)
+        self._submit.emit(job)
+        return job
+
+    def cancel(self, job):
+        job.cancelled = True
+        self._executor.interrupt(job)
+
+    # Отменяет текущее задание канала, если оно есть
+    def cancel_channel(self, channel):
+        job = self._channels.get(channel)
+        if job is not None:
+            self.cancel(job)
+
+    def is_busy(self):
+        return bool(self._pending)
+
+    # Останавливает поток; вызывается при закрытии окна
+    def stop(self):
+        for job in list(self._pending):
+            self.cancel(job)
+        self._thread.quit()
+        self._thread.wait()
+
+    def _finish(self, job):
+        self._pending.discard(job)
+        if self._channels.get(job.channel) is job:
+            del self._channels[job.channel]
+        if not self._pending:
+            self.busyChanged.emit(False)
+
+    def _on_done(self, job, result):
+        self._finish(job)
+        if not job.cancelled and job.on_done is not None:
+            job.on_done(result)
+
+    def _on_failed(self, job, message):
+        self._finish(job)
+        if not job.cancelled and job.on_error is not None:
+            job.on_error(message)
+
+    def _on_progress(self, job, value):
+        if not job.cancelled and job.on_progress is not None:
+            job.on_progress(value)
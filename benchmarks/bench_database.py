@@ -0,0 +1,68 @@
+import itertools
+
+import pytest
+
+from app import arrays, reports
+from app.database import Database
+
+
+def bench_add_transaction(benchmark, ledger):
+    benchmark(ledger.add_transaction, "2024-06-15", 1, "Продукты", -350.0, "бенчмарк")
+
+
+def bench_list_transactions(benchmark, ledger):
+    benchmark(ledger.list_transactions)
+
+
+def bench_list_transactions_first_page(benchmark, ledger):
+    benchmark(ledger.list_transactions_page)
+
+
+def bench_list_transactions_search(benchmark, ledger):
+    benchmark(ledger.list_transactions_page, search="прод")
+
+
+def bench_delete_transaction(benchmark, ledger):
+    ids = itertools.count(1)
+    benchmark.pedantic(ledger.delete_transaction, setup=lambda: ((next(ids),), {}), rounds=50)
+
+
+# Удаление счёта со всеми транзакциями; каждый раунд — на новой копии журнала
+def bench_delete_account(benchmark, ledger_copy):
+    rounds = itertools.count()
+    databases = []
+
+    def setup():
+        db = Database(ledger_copy(f"ledger_{next(rounds)}.db"))
+        databases.append(db)
+        return (1,), {}
+
+    benchmark.pedantic(lambda account_id: databases[-1].delete_account(account_id), setup=setup, rounds=3)
+    for db in databases:
+        db.close()
+
+
+# Загрузка всех транзакций в столбцы NumPy и дневные итоги (как при сверке дневных балансов)
+def bench_load_transactions(benchmark, ledger):
+    benchmark(lambda: arrays.daily_totals(arrays.load_transactions(ledger)))
+
+
+# Отчёт по категориям помесячно без кэша (группировка в SQLite)
+def bench_report_monthly_categories(benchmark, ledger):
+    benchmark(reports.monthly_categories, ledger)
+
+
+# Полная сверка балансов всех счетов с журналом (один сгруппированный запрос по индексу)
+def bench_reconcile_balances_full(benchmark, ledger):
+    benchmark(ledger.reconcile_balances, full=True)
+
+
+# Данные для графика: дневные балансы счёта
+def bench_chart_series(benchmark, ledger):
+    benchmark(ledger.daily_balance_series, 1)
+
+
+# Данные для графика вместе с переводом в массивы NumPy
+def bench_chart_arrays(benchmark, ledger):
+    charts = pytest.importorskip("app.charts")
+    benchmark(lambda: charts.series_arrays(ledger.daily_balance_series(1)))
@@ -0,0 +1,62 @@
+import os
+import shutil
+from pathlib import Path
+
+import pytest
+
+from app.database import Database
+from ledger import generate_ledger
+
+# Размеры журналов (число транзакций); переопределяются переменной BENCH_SIZES="10000,100000"
+SIZES = [int(n) for n in os.environ.get("BENCH_SIZES", "10000,100000,1000000").split(",")]
+ACCOUNTS = 5
+RECEIPT_FRACTION = 0.01
+# Хранилище результатов по умолчанию у pytest-benchmark (./.benchmarks от текущей папки)
+DEFAULT_STORAGE = "file://./.benchmarks"
+
+
+# Результаты сохраняются в benchmarks/.benchmarks/ независимо от папки, из которой запущен pytest
+# (явный --benchmark-storage не переопределяется)
+def pytest_configure(config):
+    if config.option.benchmark_storage == DEFAULT_STORAGE:
+        config.option.benchmark_storage = str(Path(__file__).parent / ".benchmarks")
+
+
+# Журналы генерируются один раз за прогон и копируются для каждого бенчмарка,
+# чтобы изменения одного не влияли на другие
+@pytest.fixture(scope="session")
+def ledger_template(tmp_path_factory):
+    templates = {}
+
+    def get(size):
+        if size not in templates:
+            path = tmp_path_factory.mktemp("templates") / f"ledger_{size}.db"
+            generate_ledger(path, ACCOUNTS, size, RECEIPT_FRACTION).close()
+            templates[size] = path
+        return templates[size]
+
+    return get
+
+
+@pytest.fixture(params=SIZES, ids=lambda n: f"{n // 1000}k")
+def ledger_size(request):
+    return request.param
+
+
+# Путь к свежей копии журнала
+@pytest.fixture
+def ledger_copy(ledger_template, ledger_size, tmp_path):
+    def copy(name="ledger.db"):
+        path = tmp_path / name
+        shutil.copyfile(ledger_template(ledger_size), path)
+        return path
+
+    return copy
+
+
+# Открытая база с копией журнала
+@pytest.fixture
+def ledger(ledger_copy):
+    db = Database(ledger_copy())
+    yield db
+    db.close()
@@ -0,0 +1,71 @@
+# Генератор синтетических журналов для бенчмарков слоя Database.
+# Один и тот же seed даёт одну и ту же базу, поэтому результаты прогонов сравнимы.
+import hashlib
+import random
+from datetime import date, timedelta
+
+from app.database import Database
+
+# Категории расходов с весами: несколько частых категорий и длинный хвост редких
+EXPENSE_CATEGORIES = [
+    "Продукты", "Транспорт", "Кафе", "Коммунальные услуги", "Связь", "Здоровье", "Одежда",
+    "Развлечения", "Подарки", "Дом", "Образование", "Путешествия", "Спорт", "Животные",
+    "Красота", "Техника", "Книги", "Благотворительность", "Штрафы", "Прочее",
+]
+INCOME_CATEGORIES = ["Зарплата", "Аванс", "Кешбэк", "Проценты", "Возврат"]
+INCOME_SHARE = 0.08
+COMMENTS = ["", "", "", "карта", "наличные", "по акции", "онлайн", "магазин у дома", "перевод"]
+
+
+# Веса по закону Ципфа: k-я категория встречается примерно в 1/k раз реже первой
+def zipf_weights(n, s=1.1):
+    return [1 / (k ** s) for k in range(1, n + 1)]
+
+
+# Генерирует кортежи (date, account, category, amount, comment) для Database.import_transactions.
+# Даты идут по возрастанию, как в реальной выписке, в пределах years лет до end.
+def generate_rows(accounts, transactions, seed=0, years=5, end=date(2024, 12, 31)):
+    rng = random.Random(seed)
+    names = [f"Счёт {i + 1}" for i in range(accounts)]
+    # Основной счёт используется чаще остальных
+    account_weights = zipf_weights(accounts, 0.8)
+    expense_weights = zipf_weights(len(EXPENSE_CATEGORIES))
+    income_weights = zipf_weights(len(INCOME_CATEGORIES))
+    start = end - timedelta(days=365 * years)
+    days = (end - start).days + 1
+    for i in range(transactions):
+        day = start + timedelta(days=i * days // transactions)
+        account = rng.choices(names, account_weights)[0]
+        if rng.random() < INCOME_SHARE:
+            category = rng.choices(INCOME_CATEGORIES, income_weights)[0]
+            amount = round(rng.lognormvariate(10, 0.6), 2)
+        else:
+            category = rng.choices(EXPENSE_CATEGORIES, expense_weights)[0]
+            amount = -round(rng.lognormvariate(6, 1.1), 2)
+        yield day.isoformat(), account, category, amount, rng.choice(COMMENTS)
+
+
+# Псевдо-изображение чека: уникальное содержимое заданного размера с заголовком PNG
+def fake_receipt(rng, size):
+    return b"\x89PNG\r\n\x1a\n" + rng.randbytes(size - 8)
+
+
+# Создаёт журнал в файле path: accounts счетов, transactions транзакций,
+# у доли receipt_fraction транзакций — фото чеков размером receipt_size байт.
+# Возвращает открытую Database.
+def generate_ledger(path, accounts=5, transactions=10000, receipt_fraction=0.0, receipt_size=20000, seed=0):
+    db = Database(path)
+    for i in range(accounts):
+        db.add_account(f"Счёт {i + 1}", 0)
+    db.import_transactions(generate_rows(accounts, transactions, seed))
+
+    if receipt_fraction > 0:
+        rng = random.Random(seed + 1)
+        ids = rng.sample(range(1, transactions + 1), int(transactions * receipt_fraction))
+        with db.transaction() as cur:
+            for tx_id in ids:
+                data = fake_receipt(rng, receipt_size)
+                digest = hashlib.sha256(data).hexdigest()
+                cur.execute("INSERT OR IGNORE INTO receipts(hash, data) VALUES (?, ?)", (digest, data))
+                cur.execute("UPDATE transactions SET receipt_hash=? WHERE id=?", (digest, tx_id))
+    return db
@@ -1,15 +1,40 @@
+import time
+
+STARTUP_T0 = time.perf_counter()  # до остальных импортов, чтобы учесть их время
+
 import os
+import sqlite3
 import sys
-from datetime import datetime
+from decimal import Decimal
 from pathlib import Path
 from PyQt5 import QtWidgets, QtCore, uic
 from PyQt5.QtGui import QDesktopServices
 from PyQt5.QtCore import QUrl
-from matplotlib.dates import AutoDateLocator, DateFormatter
 
-from app.database import Database
-from matplotlib.backends.backend_qt5agg import FigureCanvasQTAgg as FigureCanvas
-from matplotlib.figure import Figure
+from app.database import ARCHIVE_KEEP_YEARS, Database
+from app.exporter import export_daily_balances, export_transactions
+from app.importer import read_statement
+from app.money import format_cents
+from app.profiling import QueryProfiler, profiling_enabled, slow_query_ms
+from app.receipts import ReceiptCache
+from app.startup import StartupTimer, startup_timing_enabled
+from app.thumbnails import ThumbnailService
+from app.transactions_model import TransactionsModel
+from app.worker import DatabaseWorker
+
+# Классы форм, заранее сгенерированные из .ui скриптом tools/build_ui.py (для сборки exe).
+# Если их нет, .ui разбирается при первом использовании формы.
+try:
+    from ui.main_window_ui import Ui_MainWindow
+    from ui.add_transaction_ui import Ui_AddTransactionDialog
+    from ui.export_dialog_ui import Ui_ExportDialog
+    COMPILED_FORMS = {
+        "main_window": Ui_MainWindow,
+        "add_transaction": Ui_AddTransactionDialog,
+        "export_dialog": Ui_ExportDialog,
+    }
+except ImportError:
+    COMPILED_FORMS = {}
 
 # Если программа запущена как exe
 if getattr(sys, 'frozen', False):
@@ -29,11 +54,58 @@ def resource(rel):
     return str(QtCore.QDir.current().filePath(rel))
 
 
+# Папка дискового кэша фото чеков (системная папка кэша пользователя)
+def receipt_cache_dir():
+    location = QtCore.QStandardPaths.writableLocation(QtCore.QStandardPaths.CacheLocation)
+    return Path(location or BASE_DIR / "cache") / "receipts"
+
+
+# Классы форм, полученные разбором .ui: файл разбирается один раз за запуск
+_parsed_forms = {}
+
+
+# Создаёт форму name (ui/<name>.ui) на виджете widget.
+# Как и uic.loadUi, делает виджеты формы атрибутами widget.
+def load_form(name, widget):
+    form_class = COMPILED_FORMS.get(name) or _parsed_forms.get(name)
+    if form_class is None:
+        form_class, _ = uic.loadUiType(resource_path(f"ui/{name}.ui"))
+        _parsed_forms[name] = form_class
+    form = form_class()
+    form.setupUi(widget)
+    for attr, value in vars(form).items():
+        setattr(widget, attr, value)
+    return form
+
+
 class MainWindow(QtWidgets.QMainWindow):
-    def __init__(self):
+    def __init__(self, startup_timer=None):
         super().__init__()
-        uic.loadUi(resource_path("ui/main_window.ui"), self)
+        self.startup_timer = startup_timer or StartupTimer(STARTUP_T0, enabled=False)
+        load_form("main_window", self)
+        self.startup_timer.mark("интерфейс")
+        # Профилировщик SQL: включается ключом --sql-profile (FINANCE_SQL_PROFILE=1)
+        # или в окне «Отладка → Статистика SQL»
+        self.profiler = QueryProfiler(slow_query_ms())
+        if profiling_enabled():
+            Database.set_profiler(self.profiler)
         self.db = Database()
+        self.startup_timer.mark("открытие базы")
+
+        # Фоновый поток со своим соединением для долгих запросов; пока он занят, в строке
+        # состояния крутится индикатор
+        self.worker = DatabaseWorker(self.db.path, self)
+        self.busyIndicator = QtWidgets.QProgressBar(self)
+        self.busyIndicator.setRange(0, 0)
+        self.busyIndicator.setMaximumWidth(120)
+        self.busyIndicator.setVisible(False)
+        self.statusBar().addPermanentWidget(self.busyIndicator)
+        self.worker.busyChanged.connect(self.busyIndicator.setVisible)
+
+        # Кэш рядов графиков создаётся вместе с модулем графиков при первом построении
+        self.chart_cache = None
+        # Кэш отчётов (вместе с NumPy) создаётся при первом открытии отчётов
+        self.report_cache = None
 
         # Настройка таблиц
         self.tblAccounts.setColumnCount(2)
@@ -43,24 +115,54 @@ class MainWindow(QtWidgets.QMainWindow):
         self.tblAccounts.setSelectionBehavior(QtWidgets.QAbstractItemView.SelectRows)
         self.btnShowChart.clicked.connect(self.show_chart)  # кнопка «Показать график» вызывает метод show_chart
 
-        # Настройка таблицы транзакций
-        self.tblTransactions.setColumnCount(6)
-        self.tblTransactions.setHorizontalHeaderLabels(["Дата", "Счёт", "Категория", "Сумма", "Комментарий", "Фото"])
+        # Настройка таблицы транзакций (строки подгружаются из базы постранично)
+        self.tx_model = TransactionsModel(self.worker, self)
+        self.tblTransactions.setModel(self.tx_model)
         self.tblTransactions.horizontalHeader().setStretchLastSection(True)
         self.tblTransactions.setEditTriggers(QtWidgets.QAbstractItemView.NoEditTriggers)
         self.tblTransactions.setSelectionBehavior(QtWidgets.QAbstractItemView.SelectRows)
+        self.tblTransactions.setIconSize(QtCore.QSize(32, 32))
+        self.tblTransactions.verticalHeader().setDefaultSectionSize(36)
+        self.tx_model.pageFailed.connect(
+            lambda message: self.statusBar().showMessage(f"Не удалось загрузить транзакции: {message}", 10000)
+        )
+
+        # Миниатюры фото чеков строятся в пуле потоков и появляются в таблице по готовности;
+        # фото для просмотра берутся из дискового кэша
+        self.thumbnails = ThumbnailService(self.worker, self)
+        self.thumbnails.thumbnailsReady.connect(self.tx_model.add_thumbnails)
+        self.receipt_cache = ReceiptCache(receipt_cache_dir())
 
         # Кнопки
         self.refresh_tables()  # заполнение таблицы данными из базы
+        self.thumbnails.update()  # миниатюры для чеков, у которых их ещё нет
         self.btnAddAccount.clicked.connect(self.add_account)
         self.btnAddTx.clicked.connect(self.on_add_transaction)
         self.btnShowImage.clicked.connect(self.show_image)
         self.btnDelAccount.clicked.connect(self.delete_account)
         self.btnDelTx.clicked.connect(self.delete_transaction)
-
-        # Подключение поиска и фильтрации
-        self.searchEdit.textChanged.connect(lambda text: self.filter_transactions(text))
+        self.actionImport.triggered.connect(self.import_statement)
+        self.actionExport.triggered.connect(self.export_data)
+        self.actionArchive.triggered.connect(self.archive_years)
+        self.actionReconcile.triggered.connect(self.reconcile_balances)
+        self.actionReports.triggered.connect(self.show_reports)
+        self.actionQueryStats.triggered.connect(self.show_query_stats)
+
+        # Освобождение места в базе в простое: таймер перезапускается после каждого изменения
+        self.vacuumTimer = QtCore.QTimer(self)
+        self.vacuumTimer.setSingleShot(True)
+        self.vacuumTimer.setInterval(5000)
+        self.vacuumTimer.timeout.connect(self.vacuum_when_idle)
+
+        # Подключение поиска и фильтрации.
+        # Запрос к индексу выполняется после паузы в наборе, а не на каждое нажатие клавиши
+        self.searchTimer = QtCore.QTimer(self)
+        self.searchTimer.setSingleShot(True)
+        self.searchTimer.setInterval(300)
+        self.searchTimer.timeout.connect(lambda: self.filter_transactions(self.searchEdit.text()))
+        self.searchEdit.textChanged.connect(self.searchTimer.start)
         self.btnClearFilter.clicked.connect(lambda: self.searchEdit.setText(""))
+        self.startup_timer.mark("создание окна")
 
     # Обновление таблицы счетов и транзакций
     def refresh_tables(self):
@@ -69,21 +171,35 @@ class MainWindow(QtWidgets.QMainWindow):
         self.tblAccounts.setRowCount(0)
         for i, a in enumerate(accs):
             self.tblAccounts.insertRow(i)
-            self.tblAccounts.setItem(i, 0, QtWidgets.QTableWidgetItem(a['name']))
-            self.tblAccounts.setItem(i, 1, QtWidgets.QTableWidgetItem(str(a['balance'])))
+            name_item = QtWidgets.QTableWidgetItem(a['name'])
+            name_item.setData(QtCore.Qt.UserRole, a['id'])
+            self.tblAccounts.setItem(i, 0, name_item)
+            self.tblAccounts.setItem(i, 1, QtWidgets.QTableWidgetItem(f"{a['balance']:.2f}"))
 
         # Транзакции
-        txs = self.db.list_transactions()
-        self.tblTransactions.setRowCount(0)
-        for i, t in enumerate(txs):
-            self.tblTransactions.insertRow(i)
-            self.tblTransactions.setItem(i, 0, QtWidgets.QTableWidgetItem(t['date']))
-            self.tblTransactions.setItem(i, 1, QtWidgets.QTableWidgetItem(t['account']))
-            self.tblTransactions.setItem(i, 2, QtWidgets.QTableWidgetItem(t['category']))
-            self.tblTransactions.setItem(i, 3, QtWidgets.QTableWidgetItem(str(t['amount'])))
-            self.tblTransactions.setItem(i, 4, QtWidgets.QTableWidgetItem(t['comment']))
-            has_photo = t['photo'] is not None
-            self.tblTransactions.setItem(i, 5, QtWidgets.QTableWidgetItem("📷" if has_photo else "-"))
+        self.tx_model.reload()
+
+    # Порциями возвращает свободное место базы, пока приложение простаивает
+    def vacuum_when_idle(self):
+        self.worker.submit(
+            Database.incremental_vacuum, channel="vacuum",
+            on_done=lambda more: more and self.vacuumTimer.start()
+        )
+
+    # Показывает ошибку фонового задания
+    def show_worker_error(self, title):
+        return lambda message: QtWidgets.QMessageBox.critical(self, "Ошибка", f"{title}:\n{message}")
+
+    # Останавливает фоновый поток при закрытии окна
+    def closeEvent(self, event):
+        if self.chart_cache is not None:
+            Database.remove_write_listener(self.chart_cache.invalidate)
+        if self.report_cache is not None:
+            Database.remove_write_listener(self.report_cache.invalidate)
+        self.thumbnails.stop()
+        self.worker.stop()
+        self.db.close()
+        super().closeEvent(event)
 
     # Добавление счета
     def add_account(self):
@@ -98,21 +214,15 @@ class MainWindow(QtWidgets.QMainWindow):
         )
         if not ok:
             return
-        # Добавление счёта в базу данных и обновление таблицы
-        self.db.add_account(name.strip(), balance)
-        self.refresh_tables()
+        # Добавление счёта в базу данных (в фоновом потоке) и обновление таблицы
+        self.worker.submit(
+            Database.add_account, name.strip(), balance,
+            on_done=lambda _: self.refresh_tables(), on_error=self.show_worker_error("Не удалось добавить счёт")
+        )
 
-    # Фильтрует строки таблицы транзакций по введённому слову
+    # Фильтрует транзакции по введённым словам (поиск по индексу FTS5 в базе)
     def filter_transactions(self, keyword):
-        keyword = keyword.lower().strip()
-        for row in range(self.tblTransactions.rowCount()):
-            match = False
-            for col in range(self.tblTransactions.columnCount()):
-                item = self.tblTransactions.item(row, col)
-                if item and keyword in item.text().lower():
-                    match = True
-                    break
-            self.tblTransactions.setRowHidden(row, not match)
+        self.tx_model.set_search(keyword)
 
     # Постройка графика для счета
     def show_chart(self):
@@ -132,72 +242,40 @@ class MainWindow(QtWidgets.QMainWindow):
             QtWidgets.QMessageBox.warning(self, "Ошибка", "Счёт не найден.")
             return
 
-        txs = [
-            t for t in self.db.list_transactions()
-            if self.db.conn.execute(
-                "SELECT id FROM accounts WHERE name=?", (t["account"],)
-            ).fetchone()["id"] == selected_id
-        ]
-
-        if not txs:
-            QtWidgets.QMessageBox.information(self, "Нет данных", "Для выбранного счёта нет транзакций.")
+        # matplotlib и NumPy загружаются только при первом построении графика
+        from app import charts
+        if self.chart_cache is None:
+            self.chart_cache = charts.SeriesCache()
+            Database.add_write_listener(self.chart_cache.invalidate)
+
+        # Дневные балансы счёта уже посчитаны в таблице daily_balances; ряд читается
+        # и переводится в массивы в фоне, а затем кэшируется до следующей записи по счёту
+        key = (selected_id, None, None)
+        cached = self.chart_cache.get(key)
+        if cached is not None:
+            self.draw_chart(account, cached)
             return
 
-        daily = {}
-        for t in txs:
-            d = t["date"]
-            amt = float(t["amount"])
-            daily[d] = daily.get(d, 0) + amt
+        generation = self.chart_cache.generation(selected_id)
 
-        # Сортировка дат и вычисление накопительного баланса
-        try:
-            dates = [datetime.strptime(d, "%Y-%m-%d") for d in sorted(daily.keys())]
-        except Exception:
-            dates = sorted(daily.keys())
-
-        balance = []
-        current_balance = account["balance"]  # Текущий баланс в базе
-
-        total_transactions = sum(daily.values())
-        start_balance = current_balance - total_transactions
-
-        running_balance = start_balance
-        for d in sorted(daily.keys()):
-            running_balance += daily[d]
-            balance.append(running_balance)
-
-        # Строим график
-        dialog = QtWidgets.QDialog(self)
-        dialog.setWindowTitle(f"График счёта: {account['name']}")
-        dialog.resize(900, 600)
-
-        fig = Figure(figsize=(9, 6))
-        canvas = FigureCanvas(fig)
-        ax = fig.add_subplot(111)
-
-        layout = QtWidgets.QVBoxLayout(dialog)
-        layout.addWidget(canvas)
-
-        ax.plot(dates, balance, marker='o', linestyle='-', linewidth=2)
-        ax.grid(True)
-        ax.set_title(f"Изменение баланса: {account['name']}")
-        ax.set_xlabel("Дата")
-        ax.set_ylabel("Баланс, ₽")
-
-        locator = AutoDateLocator(minticks=5, maxticks=10)  # максимум 10 подписей
-        formatter = DateFormatter("%d.%m.%Y")
-        ax.xaxis.set_major_locator(locator)
-        ax.xaxis.set_major_formatter(formatter)
-        fig.autofmt_xdate(rotation=45)
-
-        ax.text(
-            dates[-1], balance[-1],
-            f"{balance[-1]:,.2f} ₽",
-            fontsize=10, color='blue', ha='left', va='bottom'
+        def loaded(arrays):
+            self.chart_cache.put(key, arrays, generation)
+            self.draw_chart(account, arrays)
+
+        self.worker.submit(
+            lambda db: charts.series_arrays(db.daily_balance_series(selected_id)), channel="chart",
+            on_done=loaded, on_error=self.show_worker_error("Не удалось построить график")
         )
 
-        canvas.draw()
-        dialog.exec_()
+    # Рисует график баланса счёта по массивам дат и балансов
+    def draw_chart(self, account, arrays):
+        dates, balance = arrays
+        if not len(dates):
+            QtWidgets.QMessageBox.information(self, "Нет данных", "Для выбранного счёта нет транзакций.")
+            return
+
+        from app.charts import BalanceChartDialog
+        BalanceChartDialog(account["name"], dates, balance, self).exec_()
 
     # Удаление счета
     def delete_account(self):
@@ -207,6 +285,7 @@ class MainWindow(QtWidgets.QMainWindow):
             return
 
         name = self.tblAccounts.item(row, 0).text()
+        account_id = self.tblAccounts.item(row, 0).data(QtCore.Qt.UserRole)
 
         reply = QtWidgets.QMessageBox.question(
             self, "Подтверждение",
@@ -216,37 +295,21 @@ class MainWindow(QtWidgets.QMainWindow):
         if reply != QtWidgets.QMessageBox.Yes:
             return
 
-        cur = self.db.conn.cursor()
-        cur.execute("SELECT id FROM accounts WHERE name=?", (name,))
-        acc = cur.fetchone()
-        if not acc:
-            QtWidgets.QMessageBox.warning(self, "Ошибка", "Счёт не найден.")
-            return
-
-        account_id = acc["id"]
-
-        txs = self.db.conn.execute(
-            "SELECT date, category, amount FROM transactions WHERE account_id=?",
-            (account_id,)
-        ).fetchall()
-
-        # Удаление каждой транзакции через метод delete_transaction()
-        for t in txs:
-            try:
-                self.db.delete_transaction(t["date"], name, t["category"], t["amount"])
-            except Exception as e:
-                print(f"[WARNING] Ошибка при удалении транзакции: {e}")
-
-        self.db.conn.execute("DELETE FROM accounts WHERE id=?", (account_id,))
-        self.db.conn.commit()
+        # Счёт и все его транзакции удаляются одной транзакцией базы данных в фоновом потоке
+        def deleted(_):
+            self.refresh_tables()
+            self.vacuumTimer.start()
+            QtWidgets.QMessageBox.information(self, "Готово", f"Счёт '{name}' и все связанные транзакции удалены.")
 
-        self.refresh_tables()
-        QtWidgets.QMessageBox.information(self, "Готово", f"Счёт '{name}' и все связанные транзакции удалены.")
+        self.worker.submit(
+            Database.delete_account, account_id,
+            on_done=deleted, on_error=self.show_worker_error("Не удалось удалить счёт")
+        )
 
     # Добавление транзакции
     def on_add_transaction(self):
         dlg = QtWidgets.QDialog(self)
-        uic.loadUi(resource_path("ui/add_transaction.ui"), dlg)
+        load_form("add_transaction", dlg)
 
         dateEdit = dlg.findChild(QtWidgets.QDateEdit, "dateEdit")
         cmbAccount = dlg.findChild(QtWidgets.QComboBox, "cmbAccount")
@@ -260,6 +323,11 @@ class MainWindow(QtWidgets.QMainWindow):
 
         photo_path = None
 
+        # Архивные годы закрыты для записи
+        archived = self.db.archived_years()
+        if archived:
+            dateEdit.setMinimumDate(QtCore.QDate(archived[-1] + 1, 1, 1))
+
         # Загружаем счета
         accounts = self.db.list_accounts()
         for a in accounts:
@@ -289,7 +357,7 @@ class MainWindow(QtWidgets.QMainWindow):
             date = dateEdit.date().toString("yyyy-MM-dd")
             account_id = cmbAccount.currentData()
             category = edtCategory.text().strip()
-            amount = float(spinAmount.value())
+            amount = Decimal(str(spinAmount.value()))
             comment = edtComment.text().strip()
 
             if account_id is None:
@@ -306,8 +374,18 @@ class MainWindow(QtWidgets.QMainWindow):
             else:
                 amount = abs(amount)  # доход -> положительное число
 
-            self.db.add_transaction(date, account_id, category, amount, comment, photo_path)
-            self.db.update_account_balance(account_id, amount)
+            # Транзакция и изменение баланса счёта фиксируются вместе
+            try:
+                with self.db.transaction():
+                    self.db.add_transaction(date, account_id, category, amount, comment, photo_path)
+                    self.db.update_account_balance(account_id, amount)
+            except ValueError as e:
+                QtWidgets.QMessageBox.warning(self, "Ошибка", str(e))
+                return
+            except sqlite3.Error as e:
+                # Например, база занята другим процессом дольше busy_timeout; окно остаётся открытым
+                QtWidgets.QMessageBox.critical(self, "Ошибка", f"Не удалось сохранить транзакцию:\n{e}")
+                return
             dlg.accept()
 
         buttonBox.accepted.connect(handle_accept)
@@ -315,18 +393,206 @@ class MainWindow(QtWidgets.QMainWindow):
 
         if dlg.exec_() == QtWidgets.QDialog.Accepted:
             self.refresh_tables()
+            if photo_path:
+                self.thumbnails.update()
+
+    # Импорт банковской выписки (CSV/OFX)
+    def import_statement(self):
+        path, _ = QtWidgets.QFileDialog.getOpenFileName(
+            self, "Импорт выписки", "", "Выписки (*.csv *.ofx *.qfx);;Все файлы (*)"
+        )
+        if not path:
+            return
+
+        # Счёт для строк, где он не указан в самой выписке
+        names = [a["name"] for a in self.db.list_accounts()]
+        default_account = None
+        if names:
+            name, ok = QtWidgets.QInputDialog.getItem(
+                self, "Импорт", "Счёт для операций без указанного счёта:", names, 0, False
+            )
+            if not ok:
+                return
+            default_account = name
+
+        def imported(count):
+            self.refresh_tables()
+            QtWidgets.QMessageBox.information(self, "Готово", f"Импортировано транзакций: {count}")
+
+        def failed(message):
+            # Пачки, записанные до ошибки, остаются в базе
+            self.refresh_tables()
+            QtWidgets.QMessageBox.critical(self, "Ошибка", f"Не удалось импортировать выписку:\n{message}")
+
+        self.run_with_progress(
+            "Импорт", "Импортировано транзакций", Database.import_transactions,
+            read_statement(path, default_account), on_done=imported, on_error=failed
+        )
+
+    # Выполняет длинную операцию в фоновом потоке, показывая окно прогресса.
+    # Кнопка «Отмена» останавливает операцию на ближайшей пачке.
+    def run_with_progress(self, title, label, fn, *args, on_done, on_error, **kwargs):
+        progress = QtWidgets.QProgressDialog(f"{title}...", "Отмена", 0, 0, self)
+        progress.setWindowTitle(title)
+        progress.setWindowModality(QtCore.Qt.WindowModal)
+        progress.setMinimumDuration(0)
+
+        def report(value):
+            progress.setLabelText(f"{label}: {value:,}".replace(",", " "))
+
+        def done(result):
+            progress.close()
+            on_done(result)
+
+        def failed(message):
+            progress.close()
+            on_error(message)
+
+        job = self.worker.submit(fn, *args, on_done=done, on_error=failed, on_progress=report, **kwargs)
+        progress.canceled.connect(job.stop)
+        progress.show()
+
+    # Экспорт транзакций или дневных итогов в CSV/JSON Lines (опционально со сжатием gzip)
+    def export_data(self):
+        dlg = QtWidgets.QDialog(self)
+        load_form("export_dialog", dlg)
+
+        cmbReport = dlg.findChild(QtWidgets.QComboBox, "cmbReport")
+        chkDateRange = dlg.findChild(QtWidgets.QCheckBox, "chkDateRange")
+        dateFrom = dlg.findChild(QtWidgets.QDateEdit, "dateFrom")
+        dateTo = dlg.findChild(QtWidgets.QDateEdit, "dateTo")
+        cmbAccount = dlg.findChild(QtWidgets.QComboBox, "cmbAccount")
+        edtCategory = dlg.findChild(QtWidgets.QLineEdit, "edtCategory")
+        chkReceipts = dlg.findChild(QtWidgets.QCheckBox, "chkReceipts")
+        buttonBox = dlg.findChild(QtWidgets.QDialogButtonBox, "buttonBox")
+
+        dateFrom.setDate(QtCore.QDate.currentDate().addYears(-1))
+        dateTo.setDate(QtCore.QDate.currentDate())
+        chkDateRange.toggled.connect(dateFrom.setEnabled)
+        chkDateRange.toggled.connect(dateTo.setEnabled)
+        # Фильтр по категории и фото чеков есть только у транзакций
+        cmbReport.currentIndexChanged.connect(lambda i: edtCategory.setEnabled(i == 0))
+        cmbReport.currentIndexChanged.connect(lambda i: chkReceipts.setEnabled(i == 0))
+
+        cmbAccount.addItem("Все счета", None)
+        for a in self.db.list_accounts():
+            cmbAccount.addItem(a["name"], a["id"])
+
+        buttonBox.accepted.connect(dlg.accept)
+        buttonBox.rejected.connect(dlg.reject)
+        if dlg.exec_() != QtWidgets.QDialog.Accepted:
+            return
+
+        path, _ = QtWidgets.QFileDialog.getSaveFileName(
+            self, "Экспорт", "",
+            "CSV (*.csv);;CSV, сжатый gzip (*.csv.gz);;JSON Lines (*.jsonl);;JSON Lines, сжатый gzip (*.jsonl.gz)"
+        )
+        if not path:
+            return
+
+        filters = {"account_id": cmbAccount.currentData()}
+        if chkDateRange.isChecked():
+            filters["date_from"] = dateFrom.date().toString("yyyy-MM-dd")
+            filters["date_to"] = dateTo.date().toString("yyyy-MM-dd")
+
+        transactions = cmbReport.currentIndex() == 0
+        if transactions:
+            filters["category"] = edtCategory.text().strip() or None
+            if chkReceipts.isChecked():
+                receipts_dir = QtWidgets.QFileDialog.getExistingDirectory(self, "Папка для фото чеков")
+                if not receipts_dir:
+                    return
+                filters["receipts_dir"] = receipts_dir
+
+        self.run_with_progress(
+            "Экспорт", "Записано строк", export_transactions if transactions else export_daily_balances, path,
+            on_done=lambda written: QtWidgets.QMessageBox.information(self, "Готово", f"Записано строк: {written}"),
+            on_error=self.show_worker_error("Не удалось выполнить экспорт"),
+            **filters
+        )
+
+    # Перенос закрытых лет в файлы архива. Архивные транзакции по-прежнему видны в таблице,
+    # поиске, графиках и отчётах, но изменять их больше нельзя.
+    def archive_years(self):
+        last = QtCore.QDate.currentDate().year() - ARCHIVE_KEEP_YEARS
+        reply = QtWidgets.QMessageBox.question(
+            self, "Архив",
+            f"Перенести транзакции по {last} год включительно в архив?\n"
+            "Они останутся видны в таблице, поиске, графиках и отчётах, но изменять их будет нельзя.",
+            QtWidgets.QMessageBox.Yes | QtWidgets.QMessageBox.No
+        )
+        if reply != QtWidgets.QMessageBox.Yes:
+            return
+
+        def archived(count):
+            self.refresh_tables()
+            self.vacuumTimer.start()
+            QtWidgets.QMessageBox.information(self, "Готово", f"Перенесено в архив транзакций: {count}")
+
+        def failed(message):
+            # Годы, перенесённые до ошибки, остаются в архиве
+            self.refresh_tables()
+            QtWidgets.QMessageBox.critical(self, "Ошибка", f"Не удалось перенести транзакции в архив:\n{message}")
+
+        self.run_with_progress(
+            "Архив", "Перенесено транзакций", Database.archive_closed_years, on_done=archived, on_error=failed
+        )
+
+    # Сверка балансов счетов с транзакциями (проверяются счета, изменённые после прошлой сверки).
+    # Найденные расхождения можно исправить: баланс пересчитывается по журналу.
+    def reconcile_balances(self):
+        def checked(accounts):
+            drifted = [a for a in accounts if a["drift_cents"] != 0]
+            if not drifted:
+                QtWidgets.QMessageBox.information(
+                    self, "Сверка балансов", f"Расхождений нет (проверено счетов: {len(accounts)})"
+                )
+                return
+            lines = "\n".join(
+                f"{a['name']}: {format_cents(a['balance_cents'])} вместо {format_cents(a['expected_cents'])}"
+                for a in drifted
+            )
+            reply = QtWidgets.QMessageBox.question(
+                self, "Сверка балансов",
+                f"Баланс не совпадает с суммой транзакций:\n{lines}\n\nИсправить балансы по транзакциям?",
+                QtWidgets.QMessageBox.Yes | QtWidgets.QMessageBox.No
+            )
+            if reply == QtWidgets.QMessageBox.Yes:
+                self.worker.submit(
+                    Database.repair_balances, [a["account_id"] for a in drifted],
+                    on_done=lambda _: self.refresh_tables(),
+                    on_error=self.show_worker_error("Не удалось исправить балансы")
+                )
+
+        self.worker.submit(
+            lambda db: db.reconcile_balances(), channel="reconcile",
+            on_done=checked, on_error=self.show_worker_error("Не удалось сверить балансы")
+        )
+
+    # Отчёты по категориям и счетам
+    def show_reports(self):
+        from app.reports import ReportCache
+        from app.reports_dialog import ReportsDialog
+        # Запись транзакций сбрасывает только отчёты за затронутые счета и месяцы
+        if self.report_cache is None:
+            self.report_cache = ReportCache()
+            Database.add_write_listener(self.report_cache.invalidate)
+        ReportsDialog(self.worker, self.report_cache, self.db.list_accounts(), self).exec_()
+
+    # Окно статистики SQL-запросов (загружается только при первом открытии)
+    def show_query_stats(self):
+        from app.profiling_dialog import QueryStatsDialog
+        QueryStatsDialog(self.profiler, self).exec_()
 
     # Удаление транзакции
     def delete_transaction(self):
-        row = self.tblTransactions.currentRow()
-        if row < 0:
+        tx = self.tx_model.row_data(self.tblTransactions.currentIndex().row())
+        if tx is None:
             QtWidgets.QMessageBox.warning(self, "Ошибка", "Выберите транзакцию для удаления")
             return
 
-        date = self.tblTransactions.item(row, 0).text()
-        account = self.tblTransactions.item(row, 1).text()
-        category = self.tblTransactions.item(row, 2).text()
-        amount = float(self.tblTransactions.item(row, 3).text())
+        category = tx["category"]
+        amount = tx["amount"]
 
         reply = QtWidgets.QMessageBox.question(
             self, "Подтверждение",
@@ -337,8 +603,9 @@ class MainWindow(QtWidgets.QMainWindow):
             return
 
         try:
-            self.db.delete_transaction(date, account, category, amount)
+            self.db.delete_transaction(tx["id"])
             self.refresh_tables()
+            self.vacuumTimer.start()
             QtWidgets.QMessageBox.information(self, "Готово", "Транзакция и фото удалены (если было).")
 
         except ValueError as e:
@@ -348,21 +615,43 @@ class MainWindow(QtWidgets.QMainWindow):
 
     # Просмотр изображения
     def show_image(self):
-        row = self.tblTransactions.currentRow()
-        if row < 0:
+        tx = self.tx_model.row_data(self.tblTransactions.currentIndex().row())
+        if tx is None:
             QtWidgets.QMessageBox.warning(self, "Ошибка", "Выберите транзакцию")
             return
 
-        date = self.tblTransactions.item(row, 0).text()
-        account = self.tblTransactions.item(row, 1).text()
-        category = self.tblTransactions.item(row, 2).text()
-        amount = float(self.tblTransactions.item(row, 3).text())
-
-        photo_file = self.db.get_transaction_photo(date, account, category, amount)
-        if photo_file:
-            QDesktopServices.openUrl(QUrl.fromLocalFile(photo_file))
-        else:
+        receipt_hash = tx["receipt_hash"]
+        if receipt_hash is None:
             QtWidgets.QMessageBox.information(self, "Фото", "Фото не найдено для этой транзакции.")
+            return
+
+        def opened(photo_file):
+            if photo_file:
+                QDesktopServices.openUrl(QUrl.fromLocalFile(str(photo_file)))
+            else:
+                QtWidgets.QMessageBox.information(self, "Фото", "Фото не найдено для этой транзакции.")
+
+        # Фото, открытое раньше, берётся из кэша без обращения к базе
+        cached = self.receipt_cache.get(receipt_hash)
+        if cached is not None:
+            opened(cached)
+            return
+
+        def load(db):
+            data = db.get_receipt(receipt_hash)
+            return self.receipt_cache.put(receipt_hash, data) if data else None
+
+        self.worker.submit(
+            load, channel="photo",
+            on_done=opened, on_error=self.show_worker_error("Не удалось открыть фото")
+        )
+
+    # Первая отрисовка окна завершает замер времени запуска
+    def paintEvent(self, event):
+        super().paintEvent(event)
+        if self.startup_timer.enabled and not self.startup_timer.reported:
+            self.startup_timer.mark("первая отрисовка")
+            self.startup_timer.report()
 
     # Обработка нажатий клавиш клавиатуры
     def keyPressEvent(self, event):
@@ -383,7 +672,11 @@ class MainWindow(QtWidgets.QMainWindow):
 # Запуск
 
 if __name__ == '__main__':
+    # Отчёт о времени запуска: FINANCE_STARTUP_TIMING=1 или ключ --startup-timing
+    startup_timer = StartupTimer(STARTUP_T0, enabled=startup_timing_enabled())
+    startup_timer.mark("импорт")
     app = QtWidgets.QApplication(sys.argv)
-    w = MainWindow()
+    startup_timer.mark("QApplication")
+    w = MainWindow(startup_timer)
     w.show()
     sys.exit(app.exec_())
@@ -0,0 +1,11 @@
+import pytest
+
+from app.database import Database
+
+
+# Новая база в файле во временной папке (у базы в памяти нет пула читателей и архивов)
+@pytest.fixture
+def db(tmp_path):
+    db = Database(tmp_path / "finance.db")
+    yield db
+    db.close()
@@ -0,0 +1,109 @@
+import datetime
+
+import pytest
+
+from app import database
+
+# Журнал за четыре года до текущего включительно: при keep=2 в архив уходят два старых года
+YEAR = datetime.date.today().year
+YEARS = range(YEAR - 3, YEAR + 1)
+
+
+@pytest.fixture
+def ledger(db):
+    db.add_account("Карта", 1000)
+    rows = []
+    for year in YEARS:
+        for month in (1, 6, 12):
+            rows.append((f"{year}-{month:02d}-15", "Карта", "Продукты", "-100.25", f"магазин {year}"))
+            rows.append((f"{year}-{month:02d}-20", "Вклад", "Проценты", "50", "проценты"))
+    db.import_transactions(rows)
+    return db
+
+
+# Все способы чтения журнала: после архивирования результаты должны совпасть
+def snapshot(db):
+    pages = []
+    after = None
+    while True:
+        page = db.list_transactions_page(after=after, limit=5)
+        if not page:
+            break
+        pages.append([r["id"] for r in page])
+        after = (page[-1]["date"], page[-1]["id"])
+    accounts = {a["name"]: a["id"] for a in db.list_accounts()}
+    return {
+        "accounts": [tuple(a) for a in db.list_accounts()],
+        "all": sorted(tuple(r) for r in db.list_transactions()),
+        "pages": pages,
+        "search": [r["id"] for r in db.list_transactions_page(search="магазин")],
+        "search_year": [r["id"] for r in db.list_transactions_page(search=f"магазин {YEAR - 3}")],
+        "period": [tuple(r) for r in db.iter_transactions(f"{YEAR - 3}-06-01", f"{YEAR - 1}-06-30")],
+        "totals": [tuple(r) for r in db.transaction_totals(("month", "account"))],
+        "series": [tuple(r) for r in db.daily_balance_series(accounts["Карта"])],
+    }
+
+
+def test_archive_closed_years_keeps_reads_unchanged(ledger):
+    before = snapshot(ledger)
+
+    assert ledger.archive_closed_years(keep=2) == 12
+    assert ledger.archived_years() == [YEAR - 3, YEAR - 2]
+    for year in (YEAR - 3, YEAR - 2):
+        assert (ledger.path.parent / "archive" / f"finance_{year}.db").exists()
+    # В основной базе остались только открытые годы
+    first = ledger.conn.execute("SELECT MIN(date) FROM transactions").fetchone()[0]
+    assert first.startswith(str(YEAR - 1))
+
+    assert snapshot(ledger) == before
+    assert ledger.archived_years(date_from=f"{YEAR - 1}-01-01") == []
+    assert ledger.integrity_check() == []
+
+
+# Архивов больше, чем можно подключить к одному соединению: чтение идёт окнами
+def test_reads_split_into_attach_windows(ledger, monkeypatch):
+    before = snapshot(ledger)
+    ledger.archive_closed_years(keep=1)
+    monkeypatch.setattr(database, "ARCHIVE_ATTACH_LIMIT", 2)
+    assert snapshot(ledger) == before
+
+
+def test_archived_years_are_read_only(ledger):
+    ledger.archive_closed_years(keep=2)
+    account_id = ledger.list_accounts()[0]["id"]
+    archived_id = next(r["id"] for r in ledger.list_transactions() if r["date"] < str(YEAR - 1))
+
+    with pytest.raises(ValueError):
+        ledger.add_transaction(f"{YEAR - 2}-03-01", account_id, "Кафе", "-10", "")
+    with pytest.raises(ValueError):
+        ledger.import_transactions([(f"{YEAR - 3}-03-01", "Карта", "Кафе", "-10", "")])
+    with pytest.raises(ValueError):
+        ledger.delete_transaction(archived_id)
+    with pytest.raises(ValueError):
+        ledger.archive_year(YEAR)
+
+    # Ошибки не оставили открытой транзакции: в открытые годы писать можно
+    assert not ledger.conn.in_transaction
+    with ledger.transaction():
+        ledger.add_transaction(f"{YEAR - 1}-03-01", account_id, "Кафе", "-10", "")
+        ledger.update_account_balance(account_id, "-10")
+    assert [a["drift_cents"] for a in ledger.reconcile_balances(full=True)] == [0, 0]
+
+
+def test_archive_requires_earliest_year_first(ledger):
+    with pytest.raises(ValueError):
+        ledger.archive_year(YEAR - 2)
+    assert ledger.archive_year(YEAR - 3) == 6
+    assert ledger.archive_year(YEAR - 3) == 0
+
+
+# Транзакции удалённого счёта остаются в файле архива, но не видны
+def test_deleted_account_hides_archived_rows(ledger):
+    ledger.archive_closed_years(keep=2)
+    accounts = {a["name"]: a["id"] for a in ledger.list_accounts()}
+    ledger.delete_account(accounts["Вклад"])
+
+    rows = ledger.list_transactions()
+    assert rows and {r["account"] for r in rows} == {"Карта"}
+    assert list(ledger.iter_transactions(account_id=accounts["Вклад"])) == []
+    assert all(r["account"] == "Карта" for r in ledger.list_transactions_page(limit=100))
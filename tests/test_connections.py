@@ -0,0 +1,67 @@
+import sqlite3
+import threading
+
+from app.database import Database
+
+
+# Новая база сразу создаётся с auto_vacuum=INCREMENTAL, и при следующем открытии
+# полный VACUUM не нужен
+def test_new_database_uses_incremental_vacuum(tmp_path, monkeypatch):
+    path = tmp_path / "finance.db"
+    Database(path).close()
+
+    vacuums = []
+    monkeypatch.setattr(Database, "vacuum", lambda self: vacuums.append(self))
+    db = Database(path)
+    try:
+        assert db.conn.execute("PRAGMA auto_vacuum").fetchone()[0] == 2
+        assert db.conn.execute("PRAGMA journal_mode").fetchone()[0] == "wal"
+    finally:
+        db.close()
+    assert vacuums == []
+
+
+# В существующей базе без auto_vacuum режим включается одним полным VACUUM
+def test_existing_database_switches_to_incremental_vacuum(tmp_path):
+    path = tmp_path / "finance.db"
+    conn = sqlite3.connect(path)
+    conn.execute("CREATE TABLE accounts(id INTEGER PRIMARY KEY AUTOINCREMENT, name TEXT, balance REAL)")
+    conn.commit()
+    conn.close()
+
+    db = Database(path)
+    try:
+        assert db.conn.execute("PRAGMA auto_vacuum").fetchone()[0] == 2
+    finally:
+        db.close()
+
+
+# interrupt() прерывает выборку, которая выполняется на соединении из пула читателей
+def test_interrupt_cancels_pooled_read(db):
+    started = threading.Event()
+    errors = []
+
+    def read():
+        with db.connections.reader() as conn:
+            started.set()
+            try:
+                conn.execute(
+                    "WITH RECURSIVE n(x) AS (SELECT 1 UNION ALL SELECT x + 1 FROM n) SELECT count(*) FROM n"
+                ).fetchone()
+            except sqlite3.OperationalError as e:
+                errors.append(e)
+
+    thread = threading.Thread(target=read, daemon=True)
+    thread.start()
+    started.wait(5)
+    # Запрос мог ещё не начаться к первому вызову — прерывание повторяется, пока поток не завершится
+    for _ in range(50):
+        db.interrupt()
+        thread.join(0.1)
+        if not thread.is_alive():
+            break
+    assert not thread.is_alive()
+    assert len(errors) == 1 and "interrupted" in str(errors[0])
+
+    # Соединение вернулось в пул и пригодно для следующих выборок
+    assert db.list_accounts() == []
@@ -0,0 +1,17 @@
+import json
+from decimal import Decimal
+
+from app.exporter import TRANSACTION_COLUMNS, write_rows
+
+
+# Сумма в JSON Lines сохраняется до копейки, даже если в float она не помещается
+def test_jsonl_keeps_exact_amount(tmp_path):
+    path = tmp_path / "export.jsonl"
+    amount = Decimal("12345678901234.56")
+    row = (1, "2024-01-15", "Карта", "Продукты", amount, "", None)
+
+    assert write_rows([row], TRANSACTION_COLUMNS, path) == 1
+
+    record = json.loads(path.read_text(encoding="utf-8"))
+    assert Decimal(record["amount"]) == amount
+    assert record["account"] == "Карта"
@@ -0,0 +1,130 @@
+from decimal import Decimal
+import re
+
+import pytest
+
+from app.database import Database
+from app.importer import read_statement
+
+
+# Ошибка в выписке после строки с новым счётом откатывает пачку целиком
+# и не оставляет соединение записи с открытой транзакцией
+def test_failed_import_leaves_database_writable(db):
+    def rows():
+        yield "2024-01-10", "Новый счёт", "Продукты", "-100.50", ""
+        raise ValueError("Не удалось распознать сумму: 'abc'")
+
+    with pytest.raises(ValueError):
+        db.import_transactions(rows())
+
+    assert not db.conn.in_transaction
+    assert db.list_accounts() == []
+
+    other = Database(db.path)
+    try:
+        other.conn.execute("PRAGMA busy_timeout = 100")
+        other.add_account("Карта", 0)
+    finally:
+        other.close()
+    assert [a["name"] for a in db.list_accounts()] == ["Карта"]
+
+
+# Счета, созданные в записанных пачках, сохраняются и используются следующими пачками
+def test_import_creates_accounts_once(db):
+    rows = [("2024-01-%02d" % day, "Карта", "Кафе", "-10", "") for day in range(1, 6)]
+    assert db.import_transactions(rows, chunk_size=2) == 5
+    accounts = db.list_accounts()
+    assert [a["name"] for a in accounts] == ["Карта"]
+    assert accounts[0]["balance"] == -50
+    assert db.reconcile_balances(full=True)[0]["drift_cents"] == 0
+
+
+# Колонки узнаются по названиям; короткие строки и отсутствующие поля читаются как пустые
+def test_read_csv_columns(tmp_path):
+    path = tmp_path / "statement.csv"
+    path.write_text(
+        "Дата;Сумма;Описание;Лишняя\n"
+        "15.01.2024;-1 234,50;Покупка;x\n"
+        "\n"
+        "16.01.2024;100\n",
+        encoding="utf-8-sig",
+    )
+    assert list(read_statement(path, "Карта")) == [
+        ("2024-01-15", "Карта", "", Decimal("-1234.50"), "Покупка"),
+        ("2024-01-16", "Карта", "", Decimal("100"), ""),
+    ]
+
+
+OFX_XML = """<?xml version="1.0" encoding="UTF-8" standalone="no"?>
+<?OFX OFXHEADER="200" VERSION="220" SECURITY="NONE" OLDFILEUID="NONE" NEWFILEUID="NONE"?>
+<OFX><BANKMSGSRSV1><STMTTRNRS><STMTRS>
+<BANKACCTFROM><BANKID>044525225</BANKID><ACCTID>40817810</ACCTID></BANKACCTFROM>
+<BANKTRANLIST>
+<STMTTRN><TRNTYPE>DEBIT</TRNTYPE><DTPOSTED>20240115120000</DTPOSTED><TRNAMT>-350.25</TRNAMT><MEMO>Покупка в магазине</MEMO></STMTTRN>
+<STMTTRN><TRNTYPE>CREDIT</TRNTYPE><DTPOSTED>20240120</DTPOSTED><TRNAMT>1000.00</TRNAMT><NAME>Зарплата</NAME></STMTTRN>
+</BANKTRANLIST>
+</STMTRS></STMTTRNRS></BANKMSGSRSV1></OFX>
+"""
+
+OFX_SGML = """OFXHEADER:100
+DATA:OFXSGML
+VERSION:102
+SECURITY:NONE
+ENCODING:{encoding}
+CHARSET:{charset}
+
+<OFX><BANKMSGSRSV1><STMTTRNRS><STMTRS>
+<BANKACCTFROM><ACCTID>40817810
+</BANKACCTFROM>
+<BANKTRANLIST>
+<STMTTRN><TRNTYPE>DEBIT<DTPOSTED>20240115<TRNAMT>-350.25<MEMO>Покупка в магазине</STMTTRN>
+</BANKTRANLIST>
+</STMTRS></STMTTRNRS></BANKMSGSRSV1></OFX>
+"""
+
+
+# OFX 2.x — XML в UTF-8
+def test_read_ofx_xml_utf8(tmp_path):
+    path = tmp_path / "statement.ofx"
+    path.write_text(OFX_XML, encoding="utf-8")
+    rows = list(read_statement(path))
+    assert [(r[0], r[1], r[3], r[4]) for r in rows] == [
+        ("2024-01-15", "40817810", Decimal("-350.25"), "Покупка в магазине"),
+        ("2024-01-20", "40817810", Decimal("1000.00"), "Зарплата"),
+    ]
+
+
+# OFX 1.x: кодировка из ENCODING/CHARSET заголовка, без неё — cp1251
+@pytest.mark.parametrize("encoding, charset, file_encoding", [
+    ("UTF-8", "NONE", "utf-8"),
+    ("USASCII", "1251", "cp1251"),
+    ("USASCII", "NONE", "cp1251"),
+])
+def test_read_ofx_sgml_header_encoding(tmp_path, encoding, charset, file_encoding):
+    path = tmp_path / "statement.ofx"
+    path.write_text(OFX_SGML.format(encoding=encoding, charset=charset), encoding=file_encoding)
+    rows = list(read_statement(path, "Карта"))
+    assert [(r[1], r[4]) for r in rows] == [("Карта", "Покупка в магазине")]
+
+
+# Заголовок из одной колонки: вместо ошибки Sniffer — понятное сообщение о недостающей колонке
+def test_read_csv_single_column_header(tmp_path):
+    path = tmp_path / "statement.csv"
+    path.write_text("Дата\n15.01.2024\n", encoding="utf-8-sig")
+    with pytest.raises(ValueError, match="amount"):
+        list(read_statement(path, "Карта"))
+
+
+# Операция без обязательного тега — ValueError с названием тега и FITID (или номером операции)
+@pytest.mark.parametrize("fitid, where", [("<FITID>A-17", "FITID A-17"), ("", "№2")])
+def test_read_ofx_missing_tag(tmp_path, fitid, where):
+    path = tmp_path / "statement.ofx"
+    path.write_text(
+        "<OFX><BANKTRANLIST>"
+        "<STMTTRN><DTPOSTED>20240115<TRNAMT>-1.00</STMTTRN>"
+        f"<STMTTRN>{fitid}<TRNAMT>-2.00<MEMO>без даты</STMTTRN>"
+        "</BANKTRANLIST></OFX>",
+        encoding="utf-8",
+    )
+    with pytest.raises(ValueError, match=re.escape(f"({where}) нет тега DTPOSTED")):
+        list(read_statement(path, "Карта"))
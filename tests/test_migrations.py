@@ -0,0 +1,85 @@
+import sqlite3
+from decimal import Decimal
+
+from app.database import Database
+
+LATEST_VERSION = 9
+
+
+# База в формате до появления миграций: суммы REAL, фото чеков в колонке transactions.photo
+def create_legacy_database(path):
+    conn = sqlite3.connect(path)
+    conn.execute("CREATE TABLE accounts(id INTEGER PRIMARY KEY AUTOINCREMENT, name TEXT, balance REAL)")
+    conn.execute('''
+        CREATE TABLE transactions(
+            id INTEGER PRIMARY KEY AUTOINCREMENT, date TEXT, account_id INTEGER,
+            category TEXT, amount REAL, comment TEXT, photo BLOB
+        )
+    ''')
+    # Баланс с накопленной ошибкой REAL и расхождением в 5 рублей с журналом
+    conn.execute("INSERT INTO accounts(name, balance) VALUES ('Карта', ?)", (0.1 + 0.2 + 1000 - 5,))
+    conn.execute("INSERT INTO accounts(name, balance) VALUES ('Наличные', 0)")
+    conn.executemany(
+        "INSERT INTO transactions(date, account_id, category, amount, comment, photo) VALUES (?, ?, ?, ?, ?, ?)",
+        [
+            ("2024-01-10", 1, "Зарплата", 1000.0, "аванс", None),
+            ("2024-01-10", 1, "Кафе", 0.1, "кофе", b"\x89PNG receipt"),
+            ("2024-01-12", 1, "Кафе", 0.2, "чай", b"\x89PNG receipt"),
+            ("2024-02-01", 2, "Продукты", -12.345, "рынок", None),
+        ],
+    )
+    # Удалённая транзакция: её id не должен выдаваться повторно
+    conn.execute("DELETE FROM transactions WHERE id = 4")
+    conn.commit()
+    conn.close()
+
+
+def test_migrations_upgrade_legacy_database(tmp_path):
+    path = tmp_path / "finance.db"
+    create_legacy_database(path)
+
+    db = Database(path)
+    try:
+        assert db.conn.execute("PRAGMA user_version").fetchone()[0] == LATEST_VERSION
+        assert db.conn.execute("PRAGMA auto_vacuum").fetchone()[0] == 2
+        assert db.integrity_check() == []
+
+        # Суммы — целые копейки, наружу — Decimal
+        accounts = {a["name"]: a for a in db.list_accounts()}
+        assert accounts["Карта"]["balance"] == Decimal("995.30")
+        rows = db.list_transactions()
+        assert sorted((r["id"], r["amount"]) for r in rows) == [
+            (1, Decimal("1000.00")), (2, Decimal("0.10")), (3, Decimal("0.20"))
+        ]
+        assert db.conn.execute("SELECT typeof(amount) FROM transactions LIMIT 1").fetchone()[0] == "integer"
+
+        # Одинаковые фото хранятся один раз
+        receipts = {r["receipt_hash"] for r in db.iter_transactions() if r["receipt_hash"]}
+        assert len(receipts) == 1
+        assert db.get_receipt(receipts.pop()) == b"\x89PNG receipt"
+
+        # Поиск, дневные итоги и внешний ключ
+        assert [r["id"] for r in db.list_transactions_page(search="коф")] == [2]
+        series = db.daily_balance_series(accounts["Карта"]["id"])
+        assert [(r["date"], r["running_cents"]) for r in series] == [("2024-01-10", 100010), ("2024-01-12", 100030)]
+        assert db.conn.execute("PRAGMA foreign_key_list(transactions)").fetchall()
+
+        # Расхождение, накопленное до миграции, стало частью начального остатка
+        assert all(r["drift_cents"] == 0 for r in db.reconcile_balances(full=True))
+
+        account_id = accounts["Наличные"]["id"]
+        with db.transaction():
+            db.add_transaction("2024-03-01", account_id, "Продукты", "-1.50", "")
+            db.update_account_balance(account_id, "-1.50")
+        assert max(r["id"] for r in db.list_transactions()) == 5
+        assert all(r["drift_cents"] == 0 for r in db.reconcile_balances(full=True))
+    finally:
+        db.close()
+
+    # Повторное открытие не выполняет миграции заново
+    db = Database(path)
+    try:
+        assert db.conn.execute("PRAGMA user_version").fetchone()[0] == LATEST_VERSION
+        assert len(db.list_transactions()) == 4
+    finally:
+        db.close()
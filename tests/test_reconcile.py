@@ -0,0 +1,96 @@
+import json
+import sqlite3
+
+import pytest
+
+from app import cli
+
+
+@pytest.fixture
+def ledger(db):
+    db.add_account("Карта", 1000)
+    db.import_transactions([
+        ("2024-01-10", "Карта", "Продукты", "-100.50", ""),
+        ("2024-01-11", "Карта", "Кафе", "-20", ""),
+        ("2024-02-01", "Карта", "Зарплата", "500", ""),
+        ("2024-02-03", "Вклад", "Проценты", "12.34", ""),
+    ])
+    return db
+
+
+def by_name(results):
+    return {r["name"]: r for r in results}
+
+
+# Правка в обход программы (другим соединением) не меняет ревизию счёта
+def tamper(db, sql, params=()):
+    conn = sqlite3.connect(db.path)
+    conn.execute(sql, params)
+    conn.commit()
+    conn.close()
+
+
+def test_incremental_check_skips_unchanged_accounts(ledger):
+    first = by_name(ledger.reconcile_balances())
+    assert set(first) == {"Карта", "Вклад"}
+    assert all(r["drift_cents"] == 0 and not r["journal_changed"] for r in first.values())
+    assert first["Карта"]["expected_cents"] == 1000 * 100 - 10050 - 2000 + 50000
+    assert ledger.reconcile_balances() == []
+
+    # Транзакция без изменения баланса — расхождение, и проверяется только изменённый счёт
+    account_id = first["Карта"]["account_id"]
+    ledger.add_transaction("2024-03-01", account_id, "Кафе", "-5", "")
+    checked = ledger.reconcile_balances()
+    assert [(r["name"], r["drift_cents"]) for r in checked] == [("Карта", 500)]
+    # Счёт с расхождением проверяется снова, пока его не исправят
+    assert [r["name"] for r in ledger.reconcile_balances()] == ["Карта"]
+
+    ledger.repair_balances([account_id])
+    assert [(r["name"], r["drift_cents"]) for r in ledger.reconcile_balances()] == [("Карта", 0)]
+    assert ledger.reconcile_balances() == []
+
+
+def test_full_check_finds_tampered_balance(ledger):
+    ledger.reconcile_balances()
+    account_id = by_name(ledger.reconcile_balances(full=True))["Вклад"]["account_id"]
+    tamper(ledger, "UPDATE accounts SET balance = balance + 777 WHERE id = ?", (account_id,))
+
+    assert ledger.reconcile_balances() == []
+    drifted = [r for r in ledger.reconcile_balances(full=True) if r["drift_cents"]]
+    assert [(r["name"], r["drift_cents"]) for r in drifted] == [("Вклад", 777)]
+
+    ledger.repair_balances([account_id])
+    assert all(r["drift_cents"] == 0 for r in ledger.reconcile_balances(full=True))
+    assert by_name(ledger.reconcile_balances(full=True))["Вклад"]["balance_cents"] == 1234
+
+
+# Суммы двух транзакций поменяны местами: итог тот же, но контрольная сумма другая
+def test_full_check_finds_journal_edit(ledger):
+    ledger.reconcile_balances()
+    first, second = list(ledger.iter_transactions(account_id=1))[:2]
+    conn = sqlite3.connect(ledger.path)
+    conn.execute("UPDATE transactions SET amount = ? WHERE id = ?", (int(second["amount"] * 100), first["id"]))
+    conn.execute("UPDATE transactions SET amount = ? WHERE id = ?", (int(first["amount"] * 100), second["id"]))
+    conn.commit()
+    conn.close()
+
+    card = by_name(ledger.reconcile_balances(full=True))["Карта"]
+    assert card["drift_cents"] == 0
+    assert card["journal_changed"]
+
+
+# python -m app reconcile --full --repair: расхождение находится и исправляется, вывод — одна строка JSON
+def test_cli_reconcile_repairs_drift(ledger, capsys):
+    ledger.reconcile_balances()
+    tamper(ledger, "UPDATE accounts SET balance = balance - 100 WHERE name = 'Карта'")
+    path = str(ledger.path)
+
+    assert cli.main(["--db", path, "reconcile", "--full", "--repair", "--daily", "--workers", "1"]) == 0
+    output = json.loads(capsys.readouterr().out)
+    assert output["status"] == "ok"
+    assert output["result"]["drifted"] == [1]
+    assert output["result"]["repaired"] == [1]
+    assert output["result"]["daily_mismatched"] == []
+
+    assert cli.main(["--db", path, "reconcile", "--full"]) == 0
+    assert json.loads(capsys.readouterr().out)["result"]["drifted"] == []
@@ -0,0 +1,15 @@
+import subprocess
+import sys
+from pathlib import Path
+
+import pytest
+
+ROOT = Path(__file__).resolve().parent.parent
+
+
+# Запуск программы не загружает NumPy и matplotlib: они нужны только отчётам и графикам
+def test_main_window_module_does_not_import_numpy():
+    pytest.importorskip("PyQt5")
+    code = "import sys, main; print(sorted({'numpy', 'matplotlib'} & set(sys.modules)))"
+    result = subprocess.run([sys.executable, "-c", code], cwd=ROOT, capture_output=True, text=True, check=True)
+    assert result.stdout.strip() == "[]"
@@ -0,0 +1,23 @@
+# Генерирует Python-классы форм из ui/*.ui (ui/<имя>_ui.py).
+# Запускается перед сборкой exe: main.py использует готовые классы и не разбирает .ui при запуске.
+#
+#   python tools/build_ui.py
+import sys
+from pathlib import Path
+
+from PyQt5 import uic
+
+UI_DIR = Path(__file__).resolve().parent.parent / "ui"
+
+
+def main():
+    for ui_file in sorted(UI_DIR.glob("*.ui")):
+        target = ui_file.with_name(f"{ui_file.stem}_ui.py")
+        with open(target, "w", encoding="utf-8") as f:
+            uic.compileUi(str(ui_file), f)
+        print(f"{ui_file.name} -> {target.name}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())